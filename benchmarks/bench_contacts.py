@@ -0,0 +1,143 @@
+"""
+Micro-benchmark for contact import pre-processing.
+
+Reports contacts/sec for utils.contacts.normalize_contacts on synthetic
+address books (a mix of valid mobiles, +91/spaced variants, duplicates,
+landlines and blank names), and how many write chunks the result needs at
+the configured contact_import_chunk_size.
+
+    python -m benchmarks.bench_contacts --sizes 1000 10000 50000
+
+With --database, each address book is instead imported end to end into the
+configured Neo4j database: normalize_contacts, then utils.user.create_friend
+with its phone filter and chunked UNWIND writes. A --registered fraction of
+the numbers is first created as users, plus the importing user. Every node
+the run creates is marked and deleted afterwards; use a scratch database,
+since synthetic numbers can collide with real users.
+
+    python -m benchmarks.bench_contacts --database --sizes 1000 10000
+"""
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from utils.contacts import normalize_contacts
+
+
+@dataclass
+class Contact:
+    name: str
+    number: str
+
+
+def address_book(size: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    contacts = []
+    for i in range(size):
+        mobile = f"{rng.choice('6789')}{rng.randrange(10**9):09d}"
+        kind = rng.random()
+        if kind < 0.5:
+            number = mobile
+        elif kind < 0.7:
+            number = f"+91 {mobile[:5]} {mobile[5:]}"
+        elif kind < 0.8 and contacts:
+            number = rng.choice(contacts).number
+        elif kind < 0.9:
+            number = f"0{rng.randrange(10**10):010d}"
+        else:
+            number = "1800-" + str(rng.randrange(10**6))
+        name = "" if rng.random() < 0.02 else f"Contact {i}"
+        contacts.append(Contact(name, number))
+    return contacts
+
+
+# Outside the 6-9 range address_book() draws mobiles from.
+IMPORTER_PHONE = "5000000000"
+
+CREATE_BENCH_USERS_QUERY = """
+UNWIND $phones AS phone
+CREATE (:User {name: 'bench contact ' + phone, phone: phone, email: 'bench-' + phone + '@example.invalid', contact: [], bench_contacts: true})
+WITH count(*) AS created
+MERGE (v:PhoneDirectoryVersion {id: 'users'})
+SET v.version = coalesce(v.version, 0) + 1
+"""
+
+DELETE_BENCH_USERS_QUERY = """
+MATCH (u:User {bench_contacts: true})
+CALL (u) {
+    DETACH DELETE u
+} IN TRANSACTIONS OF 1000 ROWS
+"""
+
+BUMP_PHONES_VERSION_QUERY = """
+MERGE (v:PhoneDirectoryVersion {id: 'users'})
+SET v.version = coalesce(v.version, 0) + 1
+"""
+
+
+async def _reset(session):
+    await (await session.run(DELETE_BENCH_USERS_QUERY)).consume()
+    await (await session.run(BUMP_PHONES_VERSION_QUERY)).consume()
+
+
+async def run_database(sizes: list, registered: float):
+    # Imported here so the in-process mode runs without database settings.
+    from database import session_scope, close_driver
+    from utils.phones import registered_phones
+    from utils.user import create_friend
+
+    print(f"{'contacts':>9} {'valid':>7} {'matched':>8} {'created':>8} {'seconds':>8} {'contacts/s':>12}")
+    try:
+        for size in sizes:
+            contacts = address_book(size)
+            rng = random.Random(size)
+            unique = sorted(set(normalize_contacts(contacts)))
+            users = rng.sample(unique, int(len(unique) * registered))
+            async with session_scope() as session:
+                await _reset(session)
+                await (await session.run(CREATE_BENCH_USERS_QUERY, phones=[IMPORTER_PHONE, *users])).consume()
+                # Warm, up-to-date phone set, as in a server that has been running.
+                await registered_phones.load(session)
+
+                started = time.perf_counter()
+                numbers = normalize_contacts(contacts)
+                report = await create_friend(numbers, IMPORTER_PHONE, session)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{size:>9} {len(numbers):>7} {report['matched_users']:>8} "
+                    f"{report['friendships_created']:>8} {elapsed:>8.3f} {size / elapsed:>12.0f}"
+                )
+    finally:
+        async with session_scope() as session:
+            await _reset(session)
+        await close_driver()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--database", action="store_true", help="import into the configured Neo4j database")
+    parser.add_argument("--registered", type=float, default=0.2, help="fraction of numbers created as users (--database)")
+    args = parser.parse_args()
+
+    if args.database:
+        asyncio.run(run_database(args.sizes, args.registered))
+        return
+
+    print(f"{'contacts':>9} {'valid':>7} {'chunks':>7} {'contacts/s':>12}")
+    for size in args.sizes:
+        contacts = address_book(size)
+        best = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            numbers = normalize_contacts(contacts)
+            best = min(best, time.perf_counter() - started)
+        chunks = -(-len(numbers) // args.chunk_size)
+        print(f"{size:>9} {len(numbers):>7} {chunks:>7} {size / best:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Micro-benchmark for password hashing throughput.
+
+Reports bcrypt hashes/sec for each work factor, single-threaded and through
+thread/process pools of the given size, to help pick bcrypt_rounds and
+password_hash_executor / password_hash_workers.
+
+    python -m benchmarks.bench_password --rounds 10 11 12 --workers 4
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from passlib.context import CryptContext
+
+PASSWORD = "correct horse battery staple"
+
+
+def _hash(rounds: int) -> str:
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash(PASSWORD)
+
+
+def bench_serial(rounds: int, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        _hash(rounds)
+    return count / (time.perf_counter() - started)
+
+
+def bench_pool(pool_cls, rounds: int, count: int, workers: int) -> float:
+    with pool_cls(max_workers=workers) as pool:
+        # Warm the workers up so process start-up is not measured.
+        list(pool.map(_hash, [4] * workers))
+        started = time.perf_counter()
+        list(pool.map(_hash, [rounds] * count))
+        return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--count", type=int, default=16, help="hashes per measurement")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'serial/s':>10} {'thread/s':>10} {'process/s':>10}")
+    for rounds in args.rounds:
+        serial = bench_serial(rounds, args.count)
+        threaded = bench_pool(ThreadPoolExecutor, rounds, args.count, args.workers)
+        processes = bench_pool(ProcessPoolExecutor, rounds, args.count, args.workers)
+        print(f"{rounds:>6} {serial:>10.1f} {threaded:>10.1f} {processes:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
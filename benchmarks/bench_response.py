@@ -0,0 +1,85 @@
+"""
+Micro-benchmark for home page rendering.
+
+Builds a personalized home page of 5 categories x 15 products (plus 5 cover
+products) shaped like the raw Neo4j node properties home() returns, with
+neo4j DateTime values, and reports encode time for FastAPI's
+jsonable_encoder + json.dumps against utils.responses.dumps (orjson), and
+the payload size uncompressed, gzipped and brotli-compressed.
+
+    python -m benchmarks.bench_response --repeat 2000
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from fastapi.encoders import jsonable_encoder
+from neo4j.time import DateTime
+from utils.responses import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def product(rng: random.Random, category: str, i: int) -> dict:
+    return {
+        "productId": str(rng.randrange(10**6)),
+        "name": f"{category} item {i}",
+        "productName": f"{category} item {i}",
+        "description": " ".join(rng.choice(["soft", "durable", "classic", "new", "lightweight", "premium"]) for _ in range(25)),
+        "price": round(rng.uniform(99, 4999), 2),
+        "productBrand": rng.choice(["Acme", "Globex", "Initech", "Umbrella", "Hooli"]),
+        "productCategory": category,
+        "category_id": f"cat-{category.lower()}",
+        "imageUrl": f"https://cdn.example.com/products/{rng.randrange(10**8)}.jpg",
+        "rating": round(rng.uniform(1, 5), 1),
+        "createdAt": DateTime(2025, rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), 0, 0),
+    }
+
+
+def home_page(seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    categories = {
+        category: [product(rng, category, i) for i in range(15)]
+        for category in ["Electronics", "Fashion", "Books", "Home", "Sports"]
+    }
+    return {
+        "categories": categories,
+        "cover_products": [product(rng, "Electronics", i) for i in range(5)],
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    page = home_page()
+    baseline = lambda: json.dumps(jsonable_encoder(page, custom_encoder={DateTime: DateTime.iso_format})).encode()
+    body = dumps(page)
+
+    print(f"{'encoder':<28} {'us/page':>10}")
+    print(f"{'jsonable_encoder + json':<28} {timed(baseline, args.repeat):>10.1f}")
+    print(f"{'orjson':<28} {timed(lambda: dumps(page), args.repeat):>10.1f}")
+    print()
+    print(f"{'encoding':<28} {'bytes':>10} {'us/page':>10}")
+    print(f"{'identity':<28} {len(body):>10}")
+    print(f"{'gzip (level 6)':<28} {len(gzip.compress(body, 6)):>10} {timed(lambda: gzip.compress(body, 6), args.repeat):>10.1f}")
+    if brotli is not None:
+        print(f"{'br (quality 4)':<28} {len(brotli.compress(body, quality=4)):>10} {timed(lambda: brotli.compress(body, quality=4), args.repeat):>10.1f}")
+    else:
+        print("br: install the brotli package to include it")
+
+
+if __name__ == "__main__":
+    main()
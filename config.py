@@ -1,16 +1,57 @@
 from pydantic_settings import BaseSettings,SettingsConfigDict
+from typing import List, Optional, Literal
 
 class Settings(BaseSettings):
     app_name: str = "SocioBuy"
     neo4j_database_uri: str
     neo4j_username: str
     neo4j_password: str
+    neo4j_max_connection_pool_size: int = 100
+    neo4j_connection_acquisition_timeout: float = 60.0
+    neo4j_max_connection_lifetime: int = 3600
+    neo4j_liveness_check_timeout: Optional[float] = None
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    auth_user_cache_size: int = 10000
+    auth_user_cache_ttl: int = 300
+    bcrypt_rounds: int = 12
+    password_hash_executor: Literal["thread", "process"] = "thread"
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 64
+    home_feed_cache_size: int = 5000
+    home_feed_max_staleness: int = 300
+    catalog_version_poll_interval: float = 5.0
+    response_compression_min_size: int = 1024
+    response_gzip_level: int = 6
+    response_brotli_quality: int = 4
+    page_size_default: int = 50
+    page_size_max: int = 200
+    admin_emails: List[str] = []
+    contact_import_chunk_size: int = 1000
+    phone_directory_enabled: bool = True
+    order_write_behind: bool = False
+    order_journal_dir: str = "order_journal"
+    order_flush_batch_size: int = 500
+    order_flush_interval: float = 0.5
+    order_flush_max_lag: float = 5.0
+    order_journal_max_pending: int = 20000
     GEMINI_API_KEY: str
+    gemini_timeout: float = 15.0
+    suggestion_mode: Literal["auto", "llm", "local"] = "auto"
+    suggestion_local_threshold: int = 1
+    gemini_batch_enabled: bool = False
+    gemini_batch_window: float = 0.05
+    gemini_batch_max_size: int = 8
+    gemini_context_per_bucket: int = 5
+    gemini_context_token_budget: int = 4000
+    gemini_cache_size: int = 2000
+    gemini_cache_ttl: int = 86400
+    gemini_cache_dir: Optional[str] = None
+    gemini_cache_disk_max_entries: int = 100000
+    gemini_cache_sweep_interval: float = 3600
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore"
-    )
\ No newline at end of file
+    )
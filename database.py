@@ -1,6 +1,10 @@
-from neo4j import GraphDatabase
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from neo4j import AsyncGraphDatabase, AsyncSession
 import config
 from functools import lru_cache
+from utils.metrics import PoolMetrics
 
 @lru_cache
 def get_settings():
@@ -8,18 +12,106 @@ def get_settings():
 
 Settings = get_settings()
 
-driver = GraphDatabase.driver(
+driver = AsyncGraphDatabase.driver(
     Settings.neo4j_database_uri,
-    auth=(Settings.neo4j_username, Settings.neo4j_password)
+    auth=(Settings.neo4j_username, Settings.neo4j_password),
+    max_connection_pool_size=Settings.neo4j_max_connection_pool_size,
+    connection_acquisition_timeout=Settings.neo4j_connection_acquisition_timeout,
+    max_connection_lifetime=Settings.neo4j_max_connection_lifetime,
+    liveness_check_timeout=Settings.neo4j_liveness_check_timeout,
 )
 
-def get_db():
+pool_metrics = PoolMetrics(Settings.neo4j_max_connection_pool_size)
 
-    session = driver.session()
+# Raised by the driver when no connection frees up within connection_acquisition_timeout.
+ACQUISITION_TIMEOUT_MESSAGE = "failed to obtain a connection from the pool"
+
+
+def _meter_acquire(pool):
+    """
+    Times every checkout from the driver pool, i.e. the wait for a free
+    connection (plus a routing table refresh when one is due). Wraps a private
+    method, so if the driver layout changes only the wait histogram is lost.
+    """
+    acquire = pool.acquire
+
+    async def metered_acquire(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await acquire(*args, **kwargs)
+        except Exception as e:
+            if ACQUISITION_TIMEOUT_MESSAGE in str(e):
+                pool_metrics.timed_out()
+            raise
+        finally:
+            pool_metrics.acquired(time.perf_counter() - started)
+
+    pool.acquire = metered_acquire
+
+
+try:
+    _meter_acquire(driver._pool)
+except AttributeError:
+    print("Neo4j driver pool not found; connection acquisition wait is not measured")
+
+
+class MeteredSession:
+    """
+    Forwards to an AsyncSession and times whole driver calls (checkout plus
+    query). Holding the session itself costs nothing: the driver only takes a
+    connection when a query or transaction starts.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def _metered(self, call, *args, **kwargs):
+        started = time.perf_counter()
+        pool_metrics.started()
+        try:
+            return await call(*args, **kwargs)
+        finally:
+            pool_metrics.finished(time.perf_counter() - started)
+
+    async def run(self, *args, **kwargs):
+        return await self._metered(self._session.run, *args, **kwargs)
+
+    async def execute_read(self, *args, **kwargs):
+        return await self._metered(self._session.execute_read, *args, **kwargs)
+
+    async def execute_write(self, *args, **kwargs):
+        return await self._metered(self._session.execute_write, *args, **kwargs)
+
+
+def pool_connections() -> Optional[Dict[str, int]]:
+    """Open/in-use/idle connections, read from the driver's pool (private API, so best effort)."""
+    try:
+        connections = [
+            connection
+            for address_connections in driver._pool.connections.values()
+            for connection in address_connections
+        ]
+        in_use = sum(1 for connection in connections if connection.in_use)
+    except AttributeError:
+        return None
+    return {"open": len(connections), "in_use": in_use, "idle": len(connections) - in_use}
+
+
+@asynccontextmanager
+async def session_scope():
+    """Opens a metered session. get_db wraps it for requests; background jobs use it directly."""
+    session = MeteredSession(driver.session())
     try:
         yield session
     finally:
-        session.close()
+        await session.close()
+
+async def get_db():
+    async with session_scope() as session:
+        yield session
 
-def close_driver():
-    driver.close()
\ No newline at end of file
+async def close_driver():
+    await driver.close()
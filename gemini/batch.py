@@ -0,0 +1,68 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+
+class SuggestionBatcher:
+    """
+    Collects carts submitted within `window` seconds (or until `max_size`
+    are waiting) and hands them to `send` as one batch. `send` returns one
+    response per cart, in order, which is fanned back to the callers.
+
+    A caller that stops waiting (e.g. its deadline passed) simply cancels its
+    own future; the rest of the batch is unaffected.
+    """
+
+    def __init__(self, send: Callable[[List[str]], Awaitable[List[Optional[str]]]], window: float, max_size: int):
+        self._send = send
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.batches = 0
+        self.batched_carts = 0
+
+    async def submit(self, cart: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((cart, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        live = [(cart, future) for cart, future in batch if not future.done()]
+        if not live:
+            return
+        self.batches += 1
+        self.batched_carts += len(live)
+        try:
+            responses = await self._send([cart for cart, _ in live])
+        except Exception as e:
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), response in zip(live, responses):
+            if not future.done():
+                future.set_result(response)
+
+    def snapshot(self):
+        return {
+            "batches": self.batches,
+            "batched_carts": self.batched_carts,
+            "pending": len(self._pending),
+        }
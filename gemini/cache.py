@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+from utils.cache import TTLCache
+
+
+def suggestion_key(cart: str, model: str, prompt_version: str) -> str:
+    """
+    Content address of a suggestion request: the cart payload with keys
+    sorted and whitespace dropped, plus the model and prompt version.
+    """
+    normalized = json.dumps(json.loads(cart), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, normalized):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SuggestionCache:
+    """
+    Two-tier cache of model responses: an in-memory LRU in front of an
+    optional directory of <key>.json files that survives restarts.
+
+    Expired files are deleted when a read finds them. Every sweep_interval
+    seconds a write also starts a background sweep that deletes the expired
+    files nobody asked for again, then the oldest ones beyond max_disk_entries.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, directory: Optional[str] = None,
+                 max_disk_entries: int = 100000, sweep_interval: float = 3600):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.sweep_interval = sweep_interval
+        self.disk_hits = 0
+        self.disk_expired = 0
+        self.disk_evicted = 0
+        self.sweeps = 0
+        self._last_sweep = time.monotonic()
+        self._sweeping = False
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self.memory.get(key)
+        if value is not None or not self.directory:
+            return value
+        return self._load(key)
+
+    def _load(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("created_at", 0) + self.ttl <= time.time():
+            self._remove(self._path(key))
+            with self._lock:
+                self.disk_expired += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self.memory.set(key, entry["response"])
+        return entry["response"]
+
+    def set(self, key: str, response: str):
+        with self._lock:
+            self.memory.set(key, response)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"created_at": time.time(), "response": response}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing suggestion cache entry: {e}")
+        self._maybe_sweep()
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            # Another worker shares the directory and got there first.
+            return False
+        except OSError as e:
+            print(f"Error removing suggestion cache entry: {e}")
+            return False
+
+    def _maybe_sweep(self):
+        with self._lock:
+            if self._sweeping or time.monotonic() - self._last_sweep < self.sweep_interval:
+                return
+            self._sweeping = True
+        threading.Thread(target=self.sweep, name="suggestion-cache-sweep", daemon=True).start()
+
+    def sweep(self) -> int:
+        """
+        Deletes expired entry files (by mtime, which is their write time) and
+        leftover temp files, then the oldest entries beyond max_disk_entries.
+        Returns the number of files deleted.
+        """
+        removed = 0
+        expired = 0
+        evicted = 0
+        try:
+            now = time.time()
+            live = []
+            for shard in os.scandir(self.directory):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    try:
+                        mtime = entry.stat().st_mtime
+                    except FileNotFoundError:
+                        continue
+                    if mtime + self.ttl > now:
+                        if entry.name.endswith(".json"):
+                            live.append((mtime, entry.path))
+                    elif self._remove(entry.path):
+                        removed += 1
+                        expired += entry.name.endswith(".json")
+            if len(live) > self.max_disk_entries:
+                live.sort()
+                for _, path in live[:len(live) - self.max_disk_entries]:
+                    if self._remove(path):
+                        removed += 1
+                        evicted += 1
+        except OSError as e:
+            print(f"Error sweeping suggestion cache: {e}")
+        finally:
+            with self._lock:
+                self.disk_expired += expired
+                self.disk_evicted += evicted
+                self.sweeps += 1
+                self._last_sweep = time.monotonic()
+                self._sweeping = False
+        return removed
+
+    async def aget(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self.memory.get(key)
+        if value is not None or not self.directory:
+            return value
+        return await asyncio.to_thread(self._load, key)
+
+    async def aset(self, key: str, response: str):
+        if not self.directory:
+            with self._lock:
+                self.memory.set(key, response)
+            return
+        await asyncio.to_thread(self.set, key, response)
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = self.memory.snapshot()
+        snapshot["disk_hits"] = self.disk_hits
+        snapshot["disk_expired"] = self.disk_expired
+        snapshot["disk_evicted"] = self.disk_evicted
+        snapshot["disk_sweeps"] = self.sweeps
+        snapshot["disk_enabled"] = bool(self.directory)
+        return snapshot
@@ -0,0 +1,144 @@
+"""
+Compaction of the cart context sent to the model.
+
+A popular brand or category in a big friend circle can contribute thousands
+of friend-order rows. Each bucket (direct_product, same_brand, same_category)
+is reduced to one entry per friend, the most recent `per_bucket` of them
+are kept, and the rest is folded into a `<bucket>_summary` with counts and
+the recency range. The per-bucket limit is lowered until the payload fits
+the token budget. If it still does not fit with no friend entries left, the
+summaries are cut down to their purchase counts, which the templates read.
+Cart items are never left out: a cart that is still over budget is sent as
+is and counted in context_metrics.over_budget.
+"""
+import json
+from typing import Any, Dict, List
+
+BUCKETS = ("direct_product", "same_brand", "same_category")
+
+
+def _tokens_for_length(length: int) -> int:
+    # ~4 characters per token for English/JSON, which is all we need for a budget.
+    return (length + 3) // 4
+
+
+def estimate_tokens(text: str) -> int:
+    return _tokens_for_length(len(text))
+
+
+def _dedupe_friends(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One entry per friend: their most recent order, with a purchase count when > 1."""
+    latest: Dict[Any, Dict[str, Any]] = {}
+    counts: Dict[Any, int] = {}
+    for entry in entries:
+        friend = entry.get("friend_name")
+        counts[friend] = counts.get(friend, 0) + 1
+        current = latest.get(friend)
+        if current is None or (entry.get("order_timestamp") or "") > (current.get("order_timestamp") or ""):
+            latest[friend] = entry
+    deduped = []
+    for friend, entry in latest.items():
+        entry = dict(entry)
+        if counts[friend] > 1:
+            entry["purchases"] = counts[friend]
+        deduped.append(entry)
+    deduped.sort(key=lambda entry: entry.get("order_timestamp") or "", reverse=True)
+    return deduped
+
+
+def _compact_item(item: Dict[str, Any], per_bucket: int) -> Dict[str, Any]:
+    compacted = dict(item)
+    for bucket in BUCKETS:
+        entries = item.get(bucket) or []
+        deduped = _dedupe_friends(entries)
+        compacted[bucket] = deduped[:per_bucket]
+        if len(deduped) > per_bucket:
+            timestamps = [entry.get("order_timestamp") for entry in entries if entry.get("order_timestamp")]
+            compacted[f"{bucket}_summary"] = {
+                "total_purchases": len(entries),
+                "unique_friends": len(deduped),
+                "omitted_friends": len(deduped) - per_bucket,
+                "latest": max(timestamps, default=None),
+                "earliest": min(timestamps, default=None),
+            }
+    return compacted
+
+
+def _over_budget(cart: List[Dict[str, Any]], token_budget: int) -> bool:
+    return estimate_tokens(json.dumps(cart)) > token_budget
+
+
+def _strip_summaries(cart: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    stripped = []
+    for item in cart:
+        item = dict(item)
+        for bucket in BUCKETS:
+            summary = item.pop(f"{bucket}_summary", None)
+            if summary:
+                # bucket_count still works off this, so templates keep their numbers.
+                item[f"{bucket}_summary"] = {"total_purchases": summary["total_purchases"]}
+        stripped.append(item)
+    return stripped
+
+
+def compact_cart(cart: List[Dict[str, Any]], per_bucket: int, token_budget: int) -> List[Dict[str, Any]]:
+    compacted = [_compact_item(item, per_bucket) for item in cart]
+    while per_bucket > 0 and _over_budget(compacted, token_budget):
+        per_bucket //= 2
+        compacted = [_compact_item(item, per_bucket) for item in cart]
+    if _over_budget(compacted, token_budget):
+        compacted = _strip_summaries(compacted)
+    return compacted
+
+
+def bucket_count(item: Dict[str, Any], bucket: str) -> int:
+    """Purchases behind a bucket, including the ones folded into its summary."""
+    summary = item.get(f"{bucket}_summary")
+    if summary:
+        return summary["total_purchases"]
+    return len(item.get(bucket) or [])
+
+
+class ContextMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.over_budget = 0
+
+    def record(self, before: str, after: str, over_budget: bool = False):
+        self.requests += 1
+        if over_budget:
+            self.over_budget += 1
+        self.bytes_before += len(before.encode())
+        self.bytes_after += len(after.encode())
+        self.tokens_before += estimate_tokens(before)
+        self.tokens_after += estimate_tokens(after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytes_saved": self.bytes_before - self.bytes_after,
+            "tokens_saved": self.tokens_before - self.tokens_after,
+            "avg_bytes_saved": (self.bytes_before - self.bytes_after) / self.requests if self.requests else 0,
+            "avg_tokens_saved": (self.tokens_before - self.tokens_after) / self.requests if self.requests else 0,
+            "over_budget": self.over_budget,
+        }
+
+
+context_metrics = ContextMetrics()
+
+
+def build_context(cart: List[Dict[str, Any]], per_bucket: int, token_budget: int) -> str:
+    """Serialized, compacted cart context; records the savings in context_metrics."""
+    compacted_cart = compact_cart(cart, per_bucket, token_budget)
+    compacted = json.dumps(compacted_cart)
+    context_metrics.record(
+        json.dumps(cart),
+        compacted,
+        # A cart with many items, or one huge item, can stay over once only counts are left.
+        over_budget=estimate_tokens(compacted) > token_budget,
+    )
+    return compacted
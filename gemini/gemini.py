@@ -1,7 +1,14 @@
 from google import genai
 from google.genai import types
 from config import Settings
+from gemini.cache import SuggestionCache, suggestion_key
+from gemini.templates import render_suggestions, render_message, signal_strength
+from gemini.stream import ProductStreamParser
+from gemini.batch import SuggestionBatcher
 from pydantic import BaseModel, Field
+from typing import Optional, Literal, AsyncIterator, Tuple, Any, List
+import asyncio
+import json
 import typing
 
 
@@ -9,10 +16,26 @@ class Product(BaseModel):
     productName: str
     message:str
 
+class CartSuggestions(BaseModel):
+    cart_id: int
+    products: list[Product]
+
 settings = Settings()
 
-def generate_suggestions(cart):
-    system_instruction = """
+MODEL = "gemini-2.5-flash"
+# Bump whenever the system instruction or response schema changes, so cached
+# suggestions produced by the old prompt stop matching.
+PROMPT_VERSION = "2"
+
+suggestion_cache = SuggestionCache(
+    maxsize=settings.gemini_cache_size,
+    ttl=settings.gemini_cache_ttl,
+    directory=settings.gemini_cache_dir,
+    max_disk_entries=settings.gemini_cache_disk_max_entries,
+    sweep_interval=settings.gemini_cache_sweep_interval,
+)
+
+SYSTEM_INSTRUCTION = """
 # Social Confidence Message Generator - LLM Prompt
 
 ## Your Mission
@@ -44,6 +67,13 @@ You will receive the following data for each product in the cart:
 - Keep buyer anonymous but reference the mutual friend
 - Example: "A friend of Mike's" or "Someone in Sarah's circle"
 
+### 5. <bucket>_summary (large friend circles)
+- When a bucket has many buyers, the list above only holds the most recent friends (one entry each,
+  with "purchases" when they bought more than once) and a summary covers the rest
+- Contains: total_purchases, unique_friends, omitted_friends, latest, earliest
+- Example: "same_brand_summary": {"total_purchases": 42, "unique_friends": 17, "omitted_friends": 12, "latest": "2024-03-15", "earliest": "2023-11-02"}
+- Use it for group narratives ("17 friends have bought from this brand")
+
 ## Output Format
 Return a JSON object with this structure:
 json
@@ -216,11 +246,47 @@ Each message should feel like it was written by a savvy friend who knows the per
 Remember: Your message appears at the moment of truth - when someone is deciding whether to complete their purchase. Make it count!
 
 """
-    client = genai.Client(
-        api_key=settings.GEMINI_API_KEY,
-    )
 
-    model = "gemini-2.5-flash"
+# Built once: the system instruction is large and never changes per request.
+GENERATE_CONTENT_CONFIG = types.GenerateContentConfig(
+    # thinking_config = types.ThinkingConfig(
+    #     thinking_budget=-1,
+    # ),
+    response_mime_type="application/json",
+    response_schema=list[Product],
+    system_instruction=[
+        types.Part.from_text(text=SYSTEM_INSTRUCTION),
+    ]
+)
+
+BATCH_INSTRUCTION = """
+## Batched Requests
+The input is a JSON object {"carts": [{"cart_id": ..., "items": [...]}]} holding several
+independent carts, each in the input structure described above. Treat every cart on its
+own and return one entry per cart: {"cart_id": <the same cart_id>, "products": [...]},
+where products follows the output format above.
+"""
+
+BATCH_GENERATE_CONTENT_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=list[CartSuggestions],
+    system_instruction=[
+        types.Part.from_text(text=SYSTEM_INSTRUCTION + BATCH_INSTRUCTION),
+    ]
+)
+
+_client: Optional[genai.Client] = None
+
+def init_client() -> genai.Client:
+    """Creates the process-wide client; called from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+        )
+    return _client
+
+async def _stream_model(cart: str) -> AsyncIterator[str]:
     contents = [
         types.Content(
             role="user",
@@ -229,23 +295,135 @@ Remember: Your message appears at the moment of truth - when someone is deciding
             ],
         ),
     ]
-    generate_content_config = types.GenerateContentConfig(
-        # thinking_config = types.ThinkingConfig(
-        #     thinking_budget=-1,
-        # ),
-        response_mime_type="application/json",
-        response_schema=list[Product],
-        system_instruction=[
-            types.Part.from_text(text=system_instruction),
-        ]
-    )
-    res = ""
-    for chunk in client.models.generate_content_stream(
-        model=model,
+    async for chunk in await init_client().aio.models.generate_content_stream(
+        model=MODEL,
         contents=contents,
-        config=generate_content_config,
+        config=GENERATE_CONTENT_CONFIG,
     ):
-        res += chunk.text
-    print(res)
+        yield chunk.text or ""
+
+async def _generate(cart: str) -> str:
+    res = ""
+    async for text in _stream_model(cart):
+        res += text
+    return res
+
+async def _generate_batch(carts: List[str]) -> List[Optional[str]]:
+    """One model call for several carts; None for any cart the model skipped."""
+    payload = json.dumps({
+        "carts": [{"cart_id": i, "items": json.loads(cart)} for i, cart in enumerate(carts)]
+    })
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=payload),
+            ],
+        ),
+    ]
+    response = await asyncio.wait_for(
+        init_client().aio.models.generate_content(
+            model=MODEL,
+            contents=contents,
+            config=BATCH_GENERATE_CONTENT_CONFIG,
+        ),
+        timeout=settings.gemini_timeout,
+    )
+    answered = {
+        entry["cart_id"]: json.dumps(entry["products"])
+        for entry in json.loads(response.text or "[]")
+    }
+    return [answered.get(i) for i in range(len(carts))]
+
+batcher = SuggestionBatcher(
+    _generate_batch,
+    window=settings.gemini_batch_window,
+    max_size=settings.gemini_batch_max_size,
+)
+
+SuggestionMode = Literal["auto", "llm", "local"]
+
+def use_local_templates(cart: str, mode: SuggestionMode) -> bool:
+    if mode == "local":
+        return True
+    if mode == "llm":
+        return False
+    return signal_strength(json.loads(cart)) < settings.suggestion_local_threshold
+
+async def generate_suggestions(cart: str, mode: Optional[SuggestionMode] = None) -> str:
+    """
+    Social proof messages for the cart. In "auto" mode carts whose friend
+    signal is below suggestion_local_threshold are answered by the local
+    templates; "llm" and "local" force one path.
+    """
+    if use_local_templates(cart, mode or settings.suggestion_mode):
+        return render_suggestions(cart)
+
+    cache_key = suggestion_key(cart, MODEL, PROMPT_VERSION)
+    cached = await suggestion_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        generation = batcher.submit(cart) if settings.gemini_batch_enabled else _generate(cart)
+        res = await asyncio.wait_for(generation, timeout=settings.gemini_timeout)
+    except asyncio.TimeoutError:
+        print(f"Gemini did not answer within {settings.gemini_timeout}s, using local suggestions")
+        return render_suggestions(cart)
+    except Exception as e:
+        print(f"Error generating suggestions: {e}")
+        return render_suggestions(cart)
+    if res is None:
+        return render_suggestions(cart)
+
+    await suggestion_cache.aset(cache_key, res)
     return res
 
+async def stream_suggestions(cart: str, mode: Optional[SuggestionMode] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming counterpart of generate_suggestions. Yields ("chunk", text) for
+    raw model output and ("product", {"productName", "message"}) as soon as
+    each object in the response array is complete. Past the deadline, or on
+    error, the products not yet sent are filled in from the local templates.
+    """
+    items = json.loads(cart)
+    if use_local_templates(cart, mode or settings.suggestion_mode):
+        res = render_suggestions(cart)
+    else:
+        cache_key = suggestion_key(cart, MODEL, PROMPT_VERSION)
+        res = await suggestion_cache.aget(cache_key)
+    if res is not None:
+        yield "chunk", res
+        for product in json.loads(res):
+            yield "product", product
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.gemini_timeout
+    parser = ProductStreamParser()
+    sent = 0
+    res = ""
+    stream = _stream_model(cart).__aiter__()
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                text = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                break
+            res += text
+            yield "chunk", text
+            for product in parser.feed(text):
+                sent += 1
+                yield "product", product
+    except Exception as e:
+        print(f"Gemini stream interrupted ({type(e).__name__}: {e}), using local suggestions for the rest")
+        await stream.aclose()
+        # The model answers in cart order, so whatever it has not sent yet is the tail.
+        for item in items[sent:]:
+            yield "product", {"productName": item.get("productName") or "", "message": render_message(item)}
+        return
+
+    await suggestion_cache.aset(cache_key, res)
@@ -0,0 +1,47 @@
+import json
+from typing import Any, Dict, List
+
+
+class ProductStreamParser:
+    """
+    Incremental parser for the model's `list[Product]` output.
+
+    Text is fed as it streams in; every `{...}` object directly inside the
+    top-level array is decoded and returned as soon as its closing brace
+    arrives, without waiting for the rest of the array.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        finished = []
+        for char in text:
+            if self._depth >= 2:
+                self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._buffer = [char]
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1 and char == "}":
+                    try:
+                        finished.append(json.loads("".join(self._buffer)))
+                    except ValueError:
+                        pass
+                    self._buffer = []
+        return finished
@@ -0,0 +1,101 @@
+"""
+Rule-driven social proof messages for carts with little or no friend signal.
+
+Covers the scenarios the Gemini system instruction describes (direct match,
+brand loyalty, category trend, no data) without leaving the process. Output
+matches the model's response schema: [{"productName": ..., "message": ...}].
+"""
+import json
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from gemini.context import BUCKETS, bucket_count
+
+NO_DATA_MESSAGES = [
+    "Looks like you're ahead of the curve - no one in your circle has bought this yet!",
+    "This one's a unique find - your friends haven't explored this product yet, but it could be a game-changer!",
+]
+
+
+def signal_strength(cart: List[Dict[str, Any]]) -> int:
+    """Number of friend purchases backing the cart, across all buckets."""
+    return sum(bucket_count(item, bucket) for item in cart for bucket in BUCKETS)
+
+
+def _when(timestamp: Optional[str], now: datetime) -> str:
+    try:
+        ordered_at = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return "recently"
+    days = (now - ordered_at.replace(tzinfo=None)).days
+    if days <= 14:
+        return "just recently"
+    if days <= 45:
+        return "last month"
+    if ordered_at.year == now.year:
+        return "earlier this year"
+    return "a while back"
+
+
+def _friends(entries: List[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(entry.get("friend_name") for entry in entries if entry.get("friend_name")))
+
+
+def _latest(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return max(entries, key=lambda entry: entry.get("order_timestamp") or "")
+
+
+def _direct_message(item, entries, now) -> str:
+    friends = _friends(entries)
+    if len(friends) == 1:
+        return f"{friends[0]} picked up this exact item {_when(_latest(entries).get('order_timestamp'), now)}!"
+    if 1 < len(friends) <= 3:
+        return f"{', '.join(friends[:-1])} and {friends[-1]} bought this exact item - great minds think alike!"
+    return f"Your friends have been all over this item lately - {bucket_count(item, 'direct_product')} purchases in your circle. They're definitely onto something good!"
+
+
+def _brand_message(item, entries, now) -> str:
+    brand = item.get("productBrand") or "this brand"
+    friends = _friends(entries)
+    if len(friends) == 1:
+        latest = _latest(entries)
+        return (
+            f"{friends[0]}'s been loyal to {brand} - they got the {latest.get('product_name')} "
+            f"{_when(latest.get('order_timestamp'), now)}."
+        )
+    return f"Your friends trust {brand} - {bucket_count(item, 'same_brand')} different purchases from your network!"
+
+
+def _category_message(item, entries, now) -> str:
+    category = item.get("productCategory") or "this category"
+    friends = _friends(entries)
+    if len(friends) == 1:
+        latest = _latest(entries)
+        return (
+            f"{friends[0]} explored {category} {_when(latest.get('order_timestamp'), now)} with the "
+            f"{latest.get('product_name')} - you're in good company."
+        )
+    return f"{category} is trending in your friend group - {bucket_count(item, 'same_category')} purchases in your circle lately!"
+
+
+def render_message(item: Dict[str, Any], now: Optional[datetime] = None) -> str:
+    now = now or datetime.now()
+    # Buckets may be summary-only after context compaction, so go by counts.
+    if bucket_count(item, "direct_product"):
+        return _direct_message(item, item.get("direct_product") or [], now)
+    if bucket_count(item, "same_brand"):
+        return _brand_message(item, item.get("same_brand") or [], now)
+    if bucket_count(item, "same_category"):
+        return _category_message(item, item.get("same_category") or [], now)
+    # Deterministic pick so the same product always reads the same way.
+    name = item.get("productName") or ""
+    return NO_DATA_MESSAGES[zlib.crc32(name.encode()) % len(NO_DATA_MESSAGES)]
+
+
+def render_suggestions(cart: str) -> str:
+    items = json.loads(cart)
+    now = datetime.now()
+    return json.dumps([
+        {"productName": item.get("productName") or "", "message": render_message(item, now)}
+        for item in items
+    ])
@@ -1,11 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
-from router.user import router as user_router 
+from database import close_driver, session_scope
+from utils.password import shutdown_executor
+from utils.feed import refresh_cold_start_feed
+from utils.graph_schema import ensure_schema
+from utils.network import backfill_missing
+from utils.etag import catalog_version
+from utils.phones import registered_phones
+from utils.order_journal import order_journal
+from config import Settings
+from utils.responses import ORJSONResponse
+from utils.compression import CompressionMiddleware
+from gemini.gemini import init_client
+from router.user import router as user_router
 from router.login import router as login_router
 from router.order import router as order_router
-from router.product import router as product_router 
+from router.product import router as product_router
 from router.home import router as home_page
 from router.cart import router as cart_router
-app = FastAPI(title="socioBuy API", version="1.0.0")
+from router.internal import router as internal_router
+from router.export import router as export_router
+
+settings = Settings()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with session_scope() as session:
+        await ensure_schema(session)
+        await registered_phones.load(session)
+        try:
+            await catalog_version.load(session)
+        except Exception as e:
+            # Polled again shortly; no ETags are issued until it loads.
+            print(f"Error loading the catalog version: {e}")
+        try:
+            backfilled = await backfill_missing(session)
+            if backfilled:
+                print(f"Backfilled the social neighbourhood of {backfilled} users")
+        except Exception as e:
+            # Retried on the next start; until then those users see the cold-start feed.
+            print(f"Error backfilling social neighbourhoods: {e}")
+    await refresh_cold_start_feed()
+    init_client()
+    catalog_version.start()
+    if settings.order_write_behind:
+        await order_journal.start()
+    yield
+    catalog_version.stop()
+    if settings.order_write_behind:
+        await order_journal.stop()
+    shutdown_executor()
+    await close_driver()
+
+app = FastAPI(title="socioBuy API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.response_compression_min_size,
+    gzip_level=settings.response_gzip_level,
+    brotli_quality=settings.response_brotli_quality,
+)
 
 router = APIRouter(prefix="/api")
 
@@ -21,4 +74,8 @@ router.include_router(product_router)
 
 router.include_router(cart_router)
 
-app.include_router(router)
\ No newline at end of file
+router.include_router(internal_router)
+
+router.include_router(export_router)
+
+app.include_router(router)
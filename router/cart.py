@@ -1,148 +1,93 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Annotated, List
+from fastapi.responses import StreamingResponse
+from typing import Annotated, List, Optional
 from router.login import verify_jwt_token
 from schemas.schema import User
-from neo4j import Session
+from neo4j import AsyncSession
 from database import get_db
 from pydantic import BaseModel
-from gemini.gemini import generate_suggestions
+from gemini.gemini import generate_suggestions, stream_suggestions, SuggestionMode
+from gemini.context import build_context
+from config import Settings
 import json
 router = APIRouter(tags=["Cart"])
+settings = Settings()
 
 user_dependency = Annotated[User, Depends(verify_jwt_token)]
 
 class CartItem(BaseModel):  
     productId: List[int]
 
-@router.post("/ai", summary="Suggest Products")
-def suggest_products(cart:CartItem,user: user_dependency, db: Session = Depends(get_db)):
-    """
-    Suggest products based on user preferences.
-    Returns a list of suggested products.
-    """
+# One round trip: every cart product with the friends who bought it, the
+# same brand or the same category, already shaped per cart item.
+CART_CONTEXT_QUERY = """
+MATCH (u:User {phone: $phone})
+UNWIND $product_id AS productId
+MATCH (pr:Product {productId: productId})
+RETURN pr.productName AS productName,
+       pr.productBrand AS productBrand,
+       pr.productCategory AS productCategory,
+       [(u)-[:FRIEND]->(f:User)-[r:ORDERS]->(pr) |
+            {friend_name: f.name, order_timestamp: r.timestamp}] AS direct_product,
+       [(u)-[:FRIEND]->(f:User)-[r:ORDERS]->(p:Product)
+            WHERE p.productBrand = pr.productBrand AND NOT coalesce(p.productName = pr.productName, false) |
+            {product_name: p.productName, friend_name: f.name, order_timestamp: r.timestamp}] AS same_brand,
+       [(u)-[:FRIEND]->(f:User)-[r:ORDERS]->(p:Product)
+            WHERE p.productCategory = pr.productCategory AND NOT coalesce(p.productName = pr.productName, false) |
+            {product_name: p.productName, friend_name: f.name, order_timestamp: r.timestamp}] AS same_category
+"""
 
-    get_products_query = """
-    WITH $product_id AS p
-    UNWIND p AS productId
-    MATCH (pr:Product {productId:productId})
-    RETURN pr """
-    products = []
+async def get_cart_context(cart: CartItem, user: User, db: AsyncSession) -> str:
+    """Serialized cart context sent to the suggestion engine, compacted to the token budget."""
     try:
-        res = db.run(get_products_query, product_id=cart.productId).data()
-        products = [item['pr'] for item in res]
-        if not products:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No products found"
-            )
+        result = await db.run(CART_CONTEXT_QUERY, phone=user.phone, product_id=cart.productId)
+        context = await result.data()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
-    product_ids = [product['productId'] for product in products]
-    # print(product_ids)
-
-    get_friend_who_ordered_query = """
-    WITH $product_id AS p
-    UNWIND p AS productId
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(f:User)-[r:ORDERS]->(pr:Product {productId: productId})
-    RETURN f.name AS friend_name, pr.productName AS product_name, r.timestamp AS order_timestamp
-    """
-    friend_product = {}
-    try:
-        friends = db.run(get_friend_who_ordered_query, phone=user.phone, product_id=product_ids).data()
-        if friends is not None:
-            for product in friends:
-                product['product_name'] = product.get('product_name')
-                product['friend_name'] = product.get('friend_name')
-                product['order_timestamp'] = product.get('order_timestamp')
-                if friend_product.get(product['product_name']) is None:
-                    friend_product[product['product_name']] = []
-                friend_product[product['product_name']].append({"friend_name": product['friend_name'], "order_timestamp": product['order_timestamp']})
-
-        # friend_product = [{"friend_name": friend['friend_name'], "product_name": friend['product_name']} for friend in friends]
-    except Exception as e:
+    if not context:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No products found"
         )
-    # print(friend_product)
-    brands = [products['productBrand'] for products in products]
-    brands = list(set(brands))
-    # print(brands)
+    return build_context(context, settings.gemini_context_per_bucket, settings.gemini_context_token_budget)
 
-    friend_who_use_same_brand_query = """
-    WITH $brands AS brands
-    UNWIND brands AS productBrand
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(f:User)-[r:ORDERS]->(p:Product{productBrand: productBrand})
-    WHERE p.productBrand IN brands
-    RETURN f.name AS friend_name, p.productBrand AS product_brand, p.productName AS product_name, r.timestamp AS order_timestamp
+@router.post("/ai", summary="Suggest Products")
+async def suggest_products(cart:CartItem,user: user_dependency, db: AsyncSession = Depends(get_db), mode: Optional[SuggestionMode] = None):
     """
-    friend_brand = {}
-    try:
-        friends = db.run(friend_who_use_same_brand_query, phone=user.phone, brands=brands).data()
-        if friends is not None:
-            for f in friends:
-                if friend_brand.get(f['product_brand']) is None:
-                    friend_brand[f['product_brand']] = []
-                friend_brand[f['product_brand']].append({"product_name": f['product_name'], "friend_name": f['friend_name'], "order_timestamp": f['order_timestamp']})
-            # friend_brand = [{"friend_name": friend['friend_name'], "product_brand": friend['product_brand']} for friend in friends]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-    # print(friend_brand)
+    Suggest products based on user preferences.
+    Returns a list of suggested products. `mode` overrides the configured
+    suggestion mode: "llm", "local" templates, or "auto".
+    """
+    cart_string = await get_cart_context(cart, user, db)
+    message = await generate_suggestions(cart_string, mode)
+    return {
+        "message": message
+    }
 
-    categories = [products['productCategory'] for products in products]
-    categories = list(set(categories))
-    # print(categories)
+def _sse(event: str, data: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
 
-    query_friend_category = """
-    WITH $categories AS categories
-    UNWIND categories AS productCategory
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(f:User)-[r:ORDERS]->(p:Product{productCategory: productCategory})
-    WHERE p.productCategory IN categories
-    RETURN f.name AS friend_name, p.productCategory AS product_category, p.productName AS product_name, r.timestamp AS order_timestamp
+@router.post("/ai/stream", summary="Suggest Products (Server-Sent Events)")
+async def stream_suggest_products(cart:CartItem,user: user_dependency, db: AsyncSession = Depends(get_db), mode: Optional[SuggestionMode] = None):
     """
+    Streaming variant of /ai.
+    Sends `product` events with one {productName, message} object each as soon
+    as it is complete, `chunk` events with the raw model output, and a final
+    `done` event.
+    """
+    cart_string = await get_cart_context(cart, user, db)
 
-    friend_category = {}
-    try:
-        friends = db.run(query_friend_category, phone=user.phone, categories=categories).data()
-        if friends is not None:
-            for friend in friends:
-                if friend_category.get(friend['product_category']) is None:
-                    friend_category[friend['product_category']] = []
-                friend_category[friend['product_category']].append({"product_name": friend['product_name'], "friend_name": friend['friend_name'], "order_timestamp": friend['order_timestamp']})
-        # friend_category = [{"friend_name": friend['friend_name'], "product_category": friend['product_category']} for friend in friends]
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-    # print(friend_category)
+    async def events():
+        async for event, data in stream_suggestions(cart_string, mode):
+            yield _sse(event, data if event == "chunk" else json.dumps(data))
+        yield _sse("done", "{}")
 
-    cart = []
-    for product in products:
-        c = {}
-        productName = product.get('productName')
-        c['productName'] = productName
-        c['productBrand'] = product.get('productBrand')
-        c['productCategory'] = product.get('productCategory')
-        c['direct_product'] = friend_product.get(productName, [])
-        same_brand_products = friend_brand.get(product['productBrand'], [])
-        c['same_brand'] = [
-            p for p in same_brand_products if p.get("product_name") != productName
-        ]
-        same_category_products = friend_category.get(product['productCategory'], [])
-        c['same_category'] = [
-            p for p in same_category_products if p.get("product_name") != productName
-        ]
-        cart.append(c)
-  
-    cart_string = json.dumps(cart)
-    message = generate_suggestions(cart_string)
-    return {
-        "message": message
-    }
\ No newline at end of file
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,20 +1,22 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from database import get_db
-from neo4j import Session
+from neo4j import AsyncSession
 from schemas.schema import UserBase
 import uuid
+from utils.feed import on_catalog_change
 
 router = APIRouter()
 
 # create category
 @router.post("/create_categories", status_code=status.HTTP_201_CREATED)
-def create_category(category: UserBase, db: Session = Depends(get_db)):
+async def create_category(category: UserBase, db: AsyncSession = Depends(get_db)):
     check_query = """
     MATCH (c:Category)
     WHERE c.name = $name
     RETURN c
     """
-    existing_category = db.run(check_query, name=category.name).single()
+    check_result = await db.run(check_query, name=category.name)
+    existing_category = await check_result.single()
 
     if existing_category:
         raise HTTPException(
@@ -36,8 +38,9 @@ def create_category(category: UserBase, db: Session = Depends(get_db)):
         "products_id": category.contact  
     }
     try:
-        result = db.run(create_category_query, params)
-        created_category_record = result.single()
+        result = await db.run(create_category_query, params)
+        created_category_record = await result.single()
+        on_catalog_change()
 
         return created_category_record.data()['c']
     except Exception as e:
@@ -49,14 +52,14 @@ def create_category(category: UserBase, db: Session = Depends(get_db)):
 
 # get all categories
 @router.get("/get_categories", status_code=status.HTTP_200_OK)
-def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_db)):
     query = """
     MATCH (c:Category)
     RETURN c
     """
     try:
-        result = db.run(query)
-        categories = [record.data()['c'] for record in result]
+        result = await db.run(query)
+        categories = [record.data()['c'] async for record in result]
         return categories
     
     except Exception as e:
@@ -68,13 +71,13 @@ def get_categories(db: Session = Depends(get_db)):
 
 # delete category
 @router.delete("/delete_category", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(category_id: str, db: Session = Depends(get_db)):
+async def delete_category(category_id: str, db: AsyncSession = Depends(get_db)):
 
     find_query = "MATCH (c:Category {category_id: $category_id}) RETURN c"
 
 
-    find_result = db.run(find_query, category_id=category_id)
-    category_node = find_result.single()
+    find_result = await db.run(find_query, category_id=category_id)
+    category_node = await find_result.single()
 
     if category_node is None:
         raise HTTPException(
@@ -88,7 +91,8 @@ def delete_category(category_id: str, db: Session = Depends(get_db)):
     """
 
     try:
-        db.run(delete_query, category_id=category_id)
+        await db.run(delete_query, category_id=category_id)
+        on_catalog_change()
         return {"detail": "Category deleted successfully."}
     
     except Exception as e:
@@ -100,7 +104,7 @@ def delete_category(category_id: str, db: Session = Depends(get_db)):
 
 #add product to category
 @router.put("/categories/{category_id}/add_products", status_code=status.HTTP_200_OK)
-def add_products_to_category(category_id: str,AddProducts: UserBase,db: Session = Depends(get_db)):
+async def add_products_to_category(category_id: str,AddProducts: UserBase,db: AsyncSession = Depends(get_db)):
 
     product_ids = AddProducts.product_ids
 
@@ -111,7 +115,8 @@ def add_products_to_category(category_id: str,AddProducts: UserBase,db: Session
         )
 
     find_category_query = "MATCH (c:Category {category_id: $category_id}) RETURN c"
-    category_node = db.run(find_category_query, category_id=category_id).single()
+    find_result = await db.run(find_category_query, category_id=category_id)
+    category_node = await find_result.single()
     if category_node is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -125,8 +130,8 @@ def add_products_to_category(category_id: str,AddProducts: UserBase,db: Session
     RETURN p.product_id AS id
     """
 
-    result = db.run(find_products_query, product_ids=product_ids)
-    found_ids = {record["id"] for record in result}
+    result = await db.run(find_products_query, product_ids=product_ids)
+    found_ids = {record["id"] async for record in result}
 
     if len(found_ids) != len(set(product_ids)):
         missing_ids = list(set(product_ids) - found_ids)
@@ -149,7 +154,9 @@ def add_products_to_category(category_id: str,AddProducts: UserBase,db: Session
     }
 
     try:
-        result = db.run(add_products_query, params).single()        
+        result = await db.run(add_products_query, params)
+        result = await result.single()
+        on_catalog_change()
         updated_category = dict(result.data()['c'])
         added_products = [dict(node) for node in result.data()['products']]
         
@@ -0,0 +1,95 @@
+from typing import AsyncIterator, Optional
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from database import session_scope
+from utils.responses import dumps
+from router.login import require_admin
+
+router = APIRouter(tags=["Export"], prefix="/export", dependencies=[Depends(require_admin)])
+
+EXPORT_PRODUCTS_QUERY = """
+MATCH (p:Product)
+RETURN properties(p) AS product
+"""
+
+EXPORT_USERS_QUERY = """
+MATCH (u:User)
+RETURN u.user_id AS user_id, u.name AS name, u.email AS email, u.phone AS phone, u.contact AS contact
+"""
+
+EXPORT_ORDERS_QUERY = """
+MATCH (u:User)-[:PLACES]->(o:Order)
+RETURN o.order_id AS order_id,
+       u.user_id AS user_id,
+       o.order_date AS order_date,
+       o.status AS status,
+       o.total_amount AS total_amount,
+       COLLECT {
+           MATCH (o)-[r:CONTAINS]->(p:Product)
+           RETURN {productId: p.productId, quantity: r.quantity, price_at_order: r.price_at_order}
+       } AS items
+"""
+
+# Checkouts made through /users/create_order are ORDERS edges, not Order nodes.
+EXPORT_ORDER_RELATIONS_QUERY = """
+MATCH (u:User)-[r:ORDERS]->(p:Product)
+RETURN u.user_id AS user_id,
+       u.email AS email,
+       p.productId AS productId,
+       r.timestamp AS timestamp,
+       r.order_key AS order_key
+"""
+
+# Lines are flushed in chunks of about this size rather than one write per row.
+CHUNK_SIZE = 64 * 1024
+
+
+async def _ndjson(query: str, column: Optional[str] = None) -> AsyncIterator[bytes]:
+    """
+    Streams query rows as NDJSON straight off the result cursor. The session
+    lives inside the generator so it stays open exactly as long as the
+    response body is being sent.
+    """
+    async with session_scope() as session:
+        result = await session.run(query)
+        buffer = []
+        size = 0
+        async for record in result:
+            row = record[column] if column else record.data()
+            line = dumps(row) + b"\n"
+            buffer.append(line)
+            size += len(line)
+            if size >= CHUNK_SIZE:
+                yield b"".join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield b"".join(buffer)
+
+
+def _ndjson_response(query: str, column: Optional[str] = None, filename: str = "export.ndjson") -> StreamingResponse:
+    return StreamingResponse(
+        _ndjson(query, column),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/products", summary="Export all products as NDJSON")
+async def export_products():
+    return _ndjson_response(EXPORT_PRODUCTS_QUERY, column="product", filename="products.ndjson")
+
+
+@router.get("/users", summary="Export all users as NDJSON")
+async def export_users():
+    return _ndjson_response(EXPORT_USERS_QUERY, filename="users.ndjson")
+
+
+@router.get("/orders", summary="Export all orders as NDJSON")
+async def export_orders():
+    return _ndjson_response(EXPORT_ORDERS_QUERY, filename="orders.ndjson")
+
+
+@router.get("/order_relations", summary="Export all checkout (ORDERS) relationships as NDJSON")
+async def export_order_relations():
+    return _ndjson_response(EXPORT_ORDER_RELATIONS_QUERY, filename="order_relations.ndjson")
@@ -1,58 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from typing import Annotated
 from router.login import verify_jwt_token
 from schemas.schema import User
-from neo4j import Session
+from neo4j import AsyncSession
 from database import get_db
+from utils.feed import home_feed_cache, cold_start_feed, COLD_START
+from utils.etag import catalog_etag, not_modified, cache_headers
+from utils.responses import dumps
 
 router = APIRouter(tags=["home"])
 
 
 user_dependency = Annotated[User, Depends(verify_jwt_token)]
 
+# The cold-start page only depends on the catalog and can be revalidated by
+# ETag. Personalized feeds follow friends' orders, which the catalog version
+# does not track, so they are never reused without asking.
+COLD_START_CACHE_CONTROL = "private, no-cache"
+PERSONALIZED_CACHE_CONTROL = "private, no-store"
+
+
+async def _cold_start_response(request: Request, response: Response, db: AsyncSession) -> Response:
+    cached = not_modified(request, response, catalog_etag("home-cold-start"), COLD_START_CACHE_CONTROL)
+    if cached is not None:
+        return cached
+    body, version = await cold_start_feed.get_versioned(db)
+    # Tagged with the version the body was built at, which may lag the live one.
+    etag = catalog_etag("home-cold-start", version) if version is not None else None
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=cache_headers(etag, COLD_START_CACHE_CONTROL)
+    )
+
+def _personalized_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": PERSONALIZED_CACHE_CONTROL})
+
 @router.get("/", summary="Home Page")
-async def home(user:user_dependency,db:Session = Depends(get_db)):
+async def home(user:user_dependency, request: Request, response: Response, db:AsyncSession = Depends(get_db)):
     """
     Home page endpoint.
     Returns categories and products from the database.
     """
-    query = """
-    MATCH (c:Product)
-    WITH DISTINCT c.productCategory AS category
-    ORDER BY category // Important for deterministic LIMIT 5
-    LIMIT 5 // Select up to 5 categories to process further
-    
-    CALL {
-        WITH category
-        MATCH (p:Product)
-        WHERE p.productCategory = category
-        WITH category, COLLECT(p) AS allProducts
-        WHERE size(allProducts) > 0 // Ensure the category has at least 1 product
-        RETURN category AS filteredCategory, allProducts[0..14] AS products // Slice to max 15
-    }
-    WITH filteredCategory, products
-    WHERE filteredCategory IS NOT NULL
-    ORDER BY filteredCategory
-    
-    UNWIND products AS product
-    RETURN filteredCategory AS category, properties(product) AS product, ID(product) AS product_id
-    ORDER BY category, product.name
-    """
-
-    query_default_cover = """
-    MATCH (p:Product) RETURN p LIMIT 5;
-    """
+    cached_feed = home_feed_cache.get(user.phone)
+    if cached_feed is COLD_START:
+        return await _cold_start_response(request, response, db)
+    if cached_feed is not None:
+        return _personalized_response(cached_feed)
 
     query_home = """
-    CALL () {
-    // Friends
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(f:User)
-    RETURN f as person
-    UNION
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(:User)-[:FRIEND]->(fof:User)
-    RETURN fof as person
-}
-WITH COLLECT(person) AS person_list
+    // Friends and friends of friends, materialized by utils.network
+    MATCH (u:User {phone: $phone})-[:NETWORK]->(person:User)
+WITH COLLECT(DISTINCT person) AS person_list
 WHERE size(person_list) > 0
 
 UNWIND person_list AS person
@@ -71,15 +70,9 @@ RETURN productCategory, products_in_category[0..15] AS limitedProducts
     """
 
     query_cover = """
-    CALL () {
-    // Friends
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(f:User)
-    RETURN f as person
-    UNION
-    MATCH (u:User {phone: $phone})-[:FRIEND]->(:User)-[:FRIEND]->(fof:User)
-    RETURN fof as person
-}
-WITH COLLECT(person) AS person_list
+    // Friends and friends of friends, materialized by utils.network
+    MATCH (u:User {phone: $phone})-[:NETWORK]->(person:User)
+WITH COLLECT(DISTINCT person) AS person_list
 WHERE size(person_list) > 0
 
 UNWIND person_list AS person
@@ -94,7 +87,8 @@ RETURN product
     categories = {}
     cover_products_list = []
     try:
-        res = db.run(query_home, phone=user.phone).data()
+        result = await db.run(query_home, phone=user.phone)
+        res = await result.data()
         # if not res:
         if res:
             for item in res:
@@ -106,31 +100,23 @@ RETURN product
                 
                 for product in products:
                     categories[category].append(product)
-            cover_products = db.run(query_cover, phone=user.phone).data()
+            result = await db.run(query_cover, phone=user.phone)
+            cover_products = await result.data()
             if cover_products:
                 for cover_product in cover_products:
                     cover_products_list.append(cover_product['product'])
-            return {
-                "categories": categories,
-                "cover_products": cover_products_list
-            }        
-        else :
-            res = db.run(query, phone=user.phone).data()
-            if res:
-                for item in res:
-                    category = item['category']
-                    product_data = item['product']
-                    
-                    if category not in categories:
-                        categories[category] = []
-                    
-                    categories[category].append(product_data)
-            cover_products = db.run(query_default_cover).data()
-            cover_products_list = [cover_product['p'] for cover_product in cover_products]
-            return {
+            feed = {
                 "categories": categories,
                 "cover_products": cover_products_list
             }
+            # Cached serialized, so a cache hit costs no encoding at all.
+            body = dumps(feed)
+            home_feed_cache.set(user.phone, body)
+            return _personalized_response(body)
+        else :
+            # No network activity: serve the shared, pre-serialized cold-start page.
+            home_feed_cache.set(user.phone, COLD_START)
+            return await _cold_start_response(request, response, db)
     except Exception as e:
         print(f"Error fetching data: {e}")
         raise HTTPException(
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, status
+from database import pool_metrics, pool_connections
+from router.login import user_cache, require_admin
+from utils.feed import home_feed_cache
+from utils.phones import registered_phones
+from utils.order_journal import order_journal
+from utils.etag import catalog_version
+from gemini.gemini import suggestion_cache, batcher
+from gemini.context import context_metrics
+
+router = APIRouter(tags=["Internal"], prefix="/internal", include_in_schema=False, dependencies=[Depends(require_admin)])
+
+@router.get("/metrics", status_code=status.HTTP_200_OK, summary="Runtime metrics")
+async def get_metrics():
+    """
+    Internal metrics export.
+    Returns connection pool saturation and cache hit rates. Admins only.
+    """
+    return {
+        "neo4j_pool": pool_metrics.snapshot(pool_connections()),
+        "auth_user_cache": user_cache.snapshot(),
+        "home_feed_cache": home_feed_cache.snapshot(),
+        "registered_phones": registered_phones.snapshot(),
+        "order_journal": order_journal.snapshot(),
+        "catalog_version": catalog_version.snapshot(),
+        "gemini_suggestion_cache": suggestion_cache.snapshot(),
+        "gemini_batcher": batcher.snapshot(),
+        "gemini_context": context_metrics.snapshot()
+    }
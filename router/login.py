@@ -1,27 +1,29 @@
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from config import Settings
 from fastapi import APIRouter, HTTPException, Depends, status, Response, Request
 from database import get_db
-from neo4j import Session
+from neo4j import AsyncSession
 from schemas.schema import UserBase, UserOut, User
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from typing import Annotated
+from utils.cache import TTLCache
+from utils.password import verify_password, get_password_hash
+from utils.phones import registered_phones
+import time
 
 settings = Settings()
 router = APIRouter(tags=["Authentication"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 ACCESS_TOKEN_COOKIE_NAME = "access_token"
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/api/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# Decoded token (subject, expiry) -> User, so protected routes skip the user lookup.
+user_cache = TTLCache(maxsize=settings.auth_user_cache_size, ttl=settings.auth_user_cache_ttl)
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def invalidate_cached_user(email: str) -> int:
+    """Drop every cached token of this user, e.g. after the user is deleted or updated."""
+    return user_cache.invalidate(lambda key: key[0] == email)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -30,7 +32,7 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserOut:
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> UserOut:
     token = request.cookies.get(ACCESS_TOKEN_COOKIE_NAME)
 
     if not token:
@@ -55,7 +57,8 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserOut
 
     query = "MATCH (u:User {email: $email}) RETURN u, elementId(u) AS node_id"
 
-    user_record = db.run(query, email=email).single()
+    result = await db.run(query, email=email)
+    user_record = await result.single()
 
     if user_record is None:
         raise credentials_exception
@@ -68,7 +71,7 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserOut
         email=user_data['email']
     )
 
-def verify_jwt_token(token: Annotated[str,Depends(oauth2_bearer)],db: Session = Depends(get_db)):
+async def verify_jwt_token(token: Annotated[str,Depends(oauth2_bearer)],db: AsyncSession = Depends(get_db)):
 
     """This is used for in protected routes for getting the current user using the JSON Web Token which was sent under the try catch block,the payload is decoded using the jwt decode from then the user is queried fronm the database to seee if it exists and if it dosent an exception is raised and if their was error in Decoding JWT another HTTPexception is raised and if there were no errors the current user is returned"""
 
@@ -85,11 +88,18 @@ def verify_jwt_token(token: Annotated[str,Depends(oauth2_bearer)],db: Session =
     except JWTError:
         raise credentials_exception
 
+    expires_at = payload.get("exp")
+    cache_key = (email, expires_at)
+    cached_user = user_cache.get(cache_key)
+    if cached_user is not None:
+        return cached_user
+
     # Assuming you are using a graph database like Neo4j with a similar driver
     # as in your first example. If using SQLAlchemy, the query would be different.
     query = "MATCH (u:User {email: $email}) RETURN u, elementId(u) AS node_id"
 
-    user_record = db.run(query, email=email).single()
+    result = await db.run(query, email=email)
+    user_record = await result.single()
     
     if not user_record:
         raise credentials_exception
@@ -97,17 +107,31 @@ def verify_jwt_token(token: Annotated[str,Depends(oauth2_bearer)],db: Session =
     user_data = user_record['u']
     if user_data is None:
         raise credentials_exception
-    return User(
-        id=str(user_data['node_id']),
+    user = User(
+        id=str(user_record['node_id']),
         name=user_data['name'],
         phone=user_data['phone'],
         email=user_data['email']
     )
+    # Never keep a user cached past the expiry of the token it was resolved from.
+    ttl = expires_at - time.time() if isinstance(expires_at, (int, float)) else None
+    user_cache.set(cache_key, user, ttl=ttl)
+    return user
+
+def require_admin(user: Annotated[User, Depends(verify_jwt_token)]) -> User:
+    """Only the accounts in admin_emails may export data or bulk-load the catalog."""
+    if user.email not in settings.admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required."
+        )
+    return user
 
 @router.post("/login", response_model=UserOut)
-def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],db: Session = Depends(get_db)):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],db: AsyncSession = Depends(get_db)):
     query = "MATCH (u:User {email: $email}) RETURN u"
-    user_record = db.run(query, email=form_data.username).single()
+    result = await db.run(query, email=form_data.username)
+    user_record = await result.single()
 
     if not user_record:
         raise HTTPException(
@@ -117,12 +141,19 @@ def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],db: Session
 
     user_data = user_record['u']
 
-    if not verify_password(form_data.password, user_data['password']):
+    valid, new_hash = await verify_password(form_data.password, user_data['password'])
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password"
         )
 
+    if new_hash:
+        # The stored hash predates the current work factor; upgrade it now
+        # that we have the plain password.
+        rehash_query = "MATCH (u:User {email: $email}) SET u.password = $password"
+        await db.run(rehash_query, email=user_data['email'], password=new_hash)
+
     access_token = create_access_token(data={"sub": user_data['email']})
     return UserOut(
         success=True,
@@ -134,9 +165,10 @@ def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],db: Session
     )
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(user: UserBase, db: Session = Depends(get_db)):
+async def register(user: UserBase, db: AsyncSession = Depends(get_db)):
     check_query = "MATCH (u:User {email: $email}) RETURN u"
-    existing_user = db.run(check_query, email=user.email).single()
+    check_result = await db.run(check_query, email=user.email)
+    existing_user = await check_result.single()
 
     if existing_user:
         raise HTTPException(
@@ -144,7 +176,7 @@ def register(user: UserBase, db: Session = Depends(get_db)):
             detail=f"A user with the email '{user.email}' already exists."
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
 
     create_user_query = """
     CREATE (u:User {
@@ -154,7 +186,10 @@ def register(user: UserBase, db: Session = Depends(get_db)):
         email: $email,
         password: $password
     })
-    RETURN u
+    WITH u
+    MERGE (v:PhoneDirectoryVersion {id: 'users'})
+    SET v.version = coalesce(v.version, 0) + 1
+    RETURN u, v.version AS phones_version
     """
     
     params = user.model_dump()
@@ -162,9 +197,10 @@ def register(user: UserBase, db: Session = Depends(get_db)):
     params["password"] = hashed_password
 
     try:
-        result = db.run(create_user_query, params)
-        created_user_record = result.single()
+        result = await db.run(create_user_query, params)
+        created_user_record = await result.single()
         user = created_user_record['u']
+        registered_phones.add(user['phone'], created_user_record['phones_version'])
         return UserOut(
             success=True,
             message="Hello " + user['name'] + "!",
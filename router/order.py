@@ -1,16 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from neo4j import AsyncSession
-from typing import List
+from typing import List, Optional, Tuple
+from datetime import datetime
 from typing import Annotated
 from router.login import verify_jwt_token
 from schemas.schema import User
+from config import Settings
 
 from database import get_db
-from schemas.schema import OrderCreate, OrderInDB, OrderStatusUpdate, OrderStatus # Changed import
+from schemas.schema import OrderCreate, OrderInDB, OrderPage, OrderStatusUpdate, OrderStatus # Changed import
 
-from utils.order import create_order, update_order_status, get_order_details
+from utils.order import create_order, update_order_status, get_order_details, get_orders_by_user
+from utils.pagination import encode_cursor, decode_cursor
 
 user_dependency = Annotated[User, Depends(verify_jwt_token)]
+settings = Settings()
 
 
 router = APIRouter(tags=["Order Management"],prefix="/orders")
@@ -28,6 +32,51 @@ async def create_order_endpoint(order: OrderCreate, session: AsyncSession = Depe
         print(f"Error creating order: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while creating the order.")
 
+def _order_cursor(after) -> Optional[Tuple[str, str]]:
+    """Validates a decoded (order_date, order_id) cursor so a bad one is a 400, not a failed query."""
+    if after is None:
+        return None
+    try:
+        order_date, order_id = after
+        if not isinstance(order_date, str) or not isinstance(order_id, str):
+            raise TypeError
+        return datetime.fromisoformat(order_date).isoformat(), order_id
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+
+@router.get("/", response_model=OrderPage, status_code=status.HTTP_200_OK, summary="Get the current user's order history")
+async def get_order_history_endpoint(
+    user: user_dependency,
+    session: AsyncSession = Depends(get_db),
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = None,
+    order_status: Optional[OrderStatus] = Query(None, alias="status"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+):
+    """
+    Lists the user's orders newest first, one page at a time, optionally
+    restricted to a status and an order_date range [date_from, date_to).
+    Pass the returned `next_cursor` back as `cursor` with the same filters.
+    """
+    after = _order_cursor(decode_cursor(cursor))
+
+    try:
+        orders = await get_orders_by_user(
+            session, user.email, limit + 1,
+            after=after, status=order_status, date_from=date_from, date_to=date_to
+        )
+    except Exception as e:
+        print(f"Error retrieving order history: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while retrieving the order history.")
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        # Keyset on (order_date, order_id): order_id breaks ties between orders placed in the same instant.
+        next_cursor = encode_cursor([orders[-1].order_date.isoformat(), orders[-1].order_id])
+    return OrderPage(items=orders, next_cursor=next_cursor)
+
 @router.put("/{order_id}/status", response_model=OrderInDB, status_code=status.HTTP_200_OK, summary="Update order status")
 async def update_order_status_endpoint(order_id: str, status_update: OrderStatusUpdate, session: AsyncSession = Depends(get_db)):
     try:
@@ -1,16 +1,29 @@
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query, UploadFile, Request, Response
 from database import get_db
-from neo4j import Session,AsyncSession
-from schemas.schema import User,Product
-from typing import Annotated,List, Optional
-from .login import verify_jwt_token
+from neo4j import AsyncSession
+from schemas.schema import User,Product,ProductPage
+from typing import Annotated,List, Optional, Literal
+from .login import verify_jwt_token, require_admin
 from uuid import uuid4
+from utils.feed import on_catalog_change
+from utils.pagination import encode_cursor, decode_cursor
+from utils.etag import catalog_etag, not_modified
+from utils.responses import ORJSONResponse
+from utils.ingest import detect_format, read_rows, ingest_products
+import io
+from config import Settings
 
 router = APIRouter(tags=["Product Management"], prefix="/products")
+settings = Settings()
 
 user_dependency = Annotated[User, Depends(verify_jwt_token)]
 
+# Catalog listings are the same for every caller, so shared caches may keep
+# them briefly; clients revalidate with If-None-Match after that.
+PRODUCT_LIST_CACHE_CONTROL = "public, max-age=60"
+SIMILAR_PRODUCTS_CACHE_CONTROL = "public, max-age=300"
+
 
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED, summary="Create a new product")
 async def create_product_endpoint(product_input: Product, db: AsyncSession = Depends(get_db)):
@@ -53,6 +66,7 @@ async def create_product_endpoint(product_input: Product, db: AsyncSession = Dep
         created_product_record = await result.single()
 
         if created_product_record:
+            on_catalog_change()
             return Product(
                 productId=created_product_record["productId"],
                 name=created_product_record["name"],
@@ -72,40 +86,88 @@ async def create_product_endpoint(product_input: Product, db: AsyncSession = Dep
         )
 
 
-@router.get("/", response_model=List[Product], status_code=status.HTTP_200_OK, summary="Get all products")
-async def get_all_products_endpoint(db: AsyncSession = Depends(get_db)):
-    query = """
-    MATCH (p:Product)
-    RETURN p.productId AS productId, p.name AS name, p.description AS description, p.price AS price, p.category_id AS category_id
+@router.post("/bulk", status_code=status.HTTP_200_OK, summary="Bulk load products from CSV or NDJSON", dependencies=[Depends(require_admin)])
+async def bulk_create_products_endpoint(
+    file: UploadFile,
+    db: AsyncSession = Depends(get_db),
+    file_format: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+):
     """
+    Validates every row as a Product and MERGEs them on productId in UNWIND
+    batches, overwriting existing products, so only admins may call it.
+    Returns counts, per-row errors and throughput.
+    """
+    fmt = file_format or detect_format(file.filename or "", file.content_type or "")
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    report = await ingest_products(db, read_rows(lines, fmt), batch_size)
+    if report["created"] or report["updated"]:
+        on_catalog_change()
+    return report
 
-    try:
-        result = await db.run(query)
-        products = []
-        async for record in result:
-            products.append(Product(
-                productId=record["productId"],
-                name=record["name"],
-                description=record["description"],
-                price=record["price"],
-                category_id=record["category_id"]
-            ))
+PRODUCT_PAGE_QUERY = """
+MATCH (p:Product)
+WHERE {predicate}
+RETURN p.productId AS productId, p.name AS name, p.description AS description, p.price AS price, p.category_id AS category_id
+ORDER BY p.productId
+LIMIT $limit
+"""
 
-        if not products:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No products found."
-            )
+@router.get("/", response_model=ProductPage, status_code=status.HTTP_200_OK, summary="Get all products")
+async def get_all_products_endpoint(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = None,
+):
+    """
+    Lists products in productId order, one page at a time.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
+    """
+    # Taken before the query: a write landing mid-query leaves the client with an older tag, never a newer one.
+    cached = not_modified(request, response, catalog_etag("products"), PRODUCT_LIST_CACHE_CONTROL)
+    if cached is not None:
+        return cached
+
+    after = decode_cursor(cursor)
+    # Keyset on the indexed productId: each page is an index range scan.
+    predicate = "p.productId IS NOT NULL" if after is None else "p.productId > $after"
 
-        return products
+    try:
+        result = await db.run(PRODUCT_PAGE_QUERY.format(predicate=predicate), after=after, limit=limit + 1)
+        records = [record async for record in result]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An internal server error occurred: {e}"
         )
 
+    if not records and after is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No products found."
+        )
+
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        # The raw stored value, so the next comparison is of the same type.
+        next_cursor = encode_cursor(records[-1]["productId"])
+    products = [
+        Product(
+            productId=record["productId"],
+            name=record["name"],
+            description=record["description"],
+            price=record["price"],
+            category_id=record["category_id"]
+        )
+        for record in records
+    ]
+    return ProductPage(items=products, next_cursor=next_cursor)
+
 @router.get("/{product_id}", status_code=status.HTTP_200_OK)
-def get_product(product_id: int, user:user_dependency, db: Session = Depends(get_db)):
+async def get_product(product_id: int, user:user_dependency, db: AsyncSession = Depends(get_db)):
     """
     Get a product by its ID.
     Returns the product details if found.
@@ -123,14 +185,8 @@ def get_product(product_id: int, user:user_dependency, db: Session = Depends(get
     mutual_friends_who_ordered_query = """
     MATCH (target:Product {productId: $productId})
     WITH target.productBrand AS targetBrand, target.productId AS targetId, target
-    CALL () {
-        MATCH (u:User {phone: $phone})-[:FRIEND]->(f:User)
-        RETURN f AS person, 'direct' AS relation
-        UNION
-        MATCH (u:User {phone: $phone})-[:FRIEND]->(:User)-[:FRIEND]->(fof:User)
-        RETURN fof AS person, 'fof' AS relation
-    }
-    WITH targetBrand, targetId, person, relation, target
+    MATCH (u:User {phone: $phone})-[n:NETWORK]->(person:User)
+    WITH targetBrand, targetId, person, n.relation AS relation, target
     WHERE person.phone <> $phone
     
     MATCH (person)-[ts:ORDERS]->(p:Product)
@@ -162,11 +218,14 @@ def get_product(product_id: int, user:user_dependency, db: Session = Depends(get
     } AS result
     """
     try:
-        friends = db.run(mutual_friends_who_ordered_query, phone=user.phone, productId=product_id).data()
+        result = await db.run(mutual_friends_who_ordered_query, phone=user.phone, productId=product_id)
+        friends = await result.data()
         if not friends:
-                    friends = db.run(product_query, phone=user.phone, productId=product_id).data()
+                    result = await db.run(product_query, phone=user.phone, productId=product_id)
+                    friends = await result.data()
 
-        return friends[0]['result']
+        # Returned as a response so the raw node properties skip jsonable_encoder.
+        return ORJSONResponse(friends[0]['result'])
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -175,7 +234,10 @@ def get_product(product_id: int, user:user_dependency, db: Session = Depends(get
     
 
 @router.get("/similar/{product_id}", response_model=List[Product], status_code=status.HTTP_200_OK, summary="Get similar products by category")
-async def get_similar_products(product_id: str, db: AsyncSession = Depends(get_db)):
+async def get_similar_products(product_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    cached = not_modified(request, response, catalog_etag("similar"), SIMILAR_PRODUCTS_CACHE_CONTROL)
+    if cached is not None:
+        return cached
 
     get_category = """
     MATCH (p:Product {productId: $productId})
@@ -197,6 +259,7 @@ async def get_similar_products(product_id: str, db: AsyncSession = Depends(get_d
         MATCH (p:Product)
         WHERE p.category_id = $categoryId AND p.productId <> $productId
         RETURN p.productId AS productId, p.name AS name, p.description AS description, p.price AS price, p.category_id AS category_id
+        ORDER BY p.productId
         """
         similar_products_result = await db.run(get_similar_products, categoryId=category_id, productId=product_id)
 
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Query
 from pydantic import BaseModel
 from database import get_db
-from neo4j import AsyncSession ,Session
+from neo4j import AsyncSession
 from schemas.schema import UserBase, User
 from typing import Annotated, List,Optional
-from .login import verify_jwt_token
-from schemas.schema import UserBase, UserInDB, ContactsUploadRequest
+from .login import verify_jwt_token, invalidate_cached_user
+from schemas.schema import UserBase, UserInDB, UserPage, ContactsUploadRequest
 from schemas.schema import OrderCreationResponse
-import re
 from uuid import uuid4
 from utils.user import create_friend,create_order_relation
+from utils.network import get_dependent_users, refresh_network
+from utils.feed import invalidate_home_feeds, invalidate_feeds_for_buyers
+from utils.pagination import encode_cursor, decode_cursor
+from utils.contacts import normalize_contacts
+from utils.phones import registered_phones
+from config import Settings
 
 router = APIRouter(prefix="/users",tags=["User Management"])
+settings = Settings()
 
 user_dependency = Annotated[User, Depends(verify_jwt_token)]
 
@@ -72,7 +78,10 @@ async def create_user_endpoint(user: UserBase, db: AsyncSession = Depends(get_db
         contact: $contact,
         email: $email
     })
-    RETURN u.user_id AS user_id, u.name AS name, u.email AS email, u.phone AS phone, u.contact AS contact
+    WITH u
+    MERGE (v:PhoneDirectoryVersion {id: 'users'})
+    SET v.version = coalesce(v.version, 0) + 1
+    RETURN u.user_id AS user_id, u.name AS name, u.email AS email, u.phone AS phone, u.contact AS contact, v.version AS phones_version
     """
     params = {
         "user_id": user_id,
@@ -88,6 +97,7 @@ async def create_user_endpoint(user: UserBase, db: AsyncSession = Depends(get_db
         created_user_record = await result.single()
 
         if created_user_record:
+            registered_phones.add(created_user_record["phone"], created_user_record["phones_version"])
             return UserInDB(
                 user_id=created_user_record["user_id"],
                 name=created_user_record["name"],
@@ -122,9 +132,21 @@ async def delete_user_endpoint(user_id: str, db: AsyncSession = Depends(get_db))
     delete_query = """
     MATCH (u:User {user_id: $user_id})
     DETACH DELETE u
+    WITH count(*) AS deleted
+    MERGE (v:PhoneDirectoryVersion {id: 'users'})
+    SET v.version = coalesce(v.version, 0) + 1
+    RETURN v.version AS phones_version
     """
     try:
-        await db.run(delete_query, user_id=user_id)
+        # Friends of the deleted user lose them and their friends from their neighbourhood.
+        dependents = await get_dependent_users(db, [user_node.phone])
+        await invalidate_feeds_for_buyers(db, [user_node.email])
+        result = await db.run(delete_query, user_id=user_id)
+        record = await result.single()
+        registered_phones.discard(user_node.phone, record["phones_version"])
+        await refresh_network(db, dependents)
+        invalidate_home_feeds(dependents)
+        invalidate_cached_user(user_node.email)
         return {}
     except Exception as e:
         print(f"Error deleting user: {e}")
@@ -134,14 +156,31 @@ async def delete_user_endpoint(user_id: str, db: AsyncSession = Depends(get_db))
         )
 
 # get all users
-@router.get("/", response_model=List[UserInDB], status_code=status.HTTP_200_OK, summary="Get all users")
-async def get_all_users_endpoint(db: AsyncSession = Depends(get_db)): 
-    query = """
-    MATCH (u:User)
-    RETURN u.user_id AS user_id, u.name AS name, u.email AS email, u.phone AS phone, u.contact AS contact
+USER_PAGE_QUERY = """
+MATCH (u:User)
+WHERE {predicate}
+RETURN u.user_id AS user_id, u.name AS name, u.email AS email, u.phone AS phone, u.contact AS contact
+ORDER BY u.email
+LIMIT $limit
+"""
+
+@router.get("/", response_model=UserPage, status_code=status.HTTP_200_OK, summary="Get all users")
+async def get_all_users_endpoint(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = None,
+):
+    """
+    Lists users in email order, one page at a time.
+    Pass the returned `next_cursor` back as `cursor` for the next page.
     """
+    after = decode_cursor(cursor)
+    # Keyset on the unique email, which /register users have too (they have no user_id).
+    # Each page is a range scan of the user_email_unique index.
+    predicate = "u.email IS NOT NULL" if after is None else "u.email > $after"
+
     try:
-        result = await db.run(query)
+        result = await db.run(USER_PAGE_QUERY.format(predicate=predicate), after=after, limit=limit + 1)
         users = []
         async for record in result:
             users.append(UserInDB(
@@ -149,16 +188,8 @@ async def get_all_users_endpoint(db: AsyncSession = Depends(get_db)):
                 name=record["name"],
                 email=record["email"],
                 phone=record["phone"],
-                contact=record.get("contact", [])
+                contact=record.get("contact") or []
             ))
-
-        if not users:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="No users found."
-            )
-        return users
-
     except Exception as e:
         print(f"Error getting users: {e}")
         raise HTTPException(
@@ -166,6 +197,18 @@ async def get_all_users_endpoint(db: AsyncSession = Depends(get_db)):
             detail=f"An internal server error occurred: {e}"
         )
 
+    if not users and after is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No users found."
+        )
+
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = encode_cursor(users[-1].email)
+    return UserPage(items=users, next_cursor=next_cursor)
+
 @router.get("/{user_id}", response_model=UserInDB, status_code=status.HTTP_200_OK, summary="Get user details by ID")
 async def get_user_details_endpoint(user_id: str, db: AsyncSession = Depends(get_db)):
     user_data = await get_user(db, user_id) 
@@ -207,63 +250,14 @@ async def get_user_contacts_endpoint(user_id: str, db: AsyncSession = Depends(ge
             detail=f"An internal server error occurred: {e}"
         )
 
-def process_contact(contacts: ImportContactsRequest): 
+@router.post("/import_contacts", status_code=status.HTTP_201_CREATED)
+async def import_contacts(contact: ImportContactsRequest, user: user_dependency, db: AsyncSession = Depends(get_db)):
     """
-    Imports contacts from a JSON string, validates them, cleans phone numbers,
-    and filters out malformed entries, helpline numbers, and invalid formats.
-
-    Args:
-        contacts_json_string (str): A JSON string containing a list of contacts.
-                                    Expected format: {"contacts": [{"name": "...", "number": "..."}, ...]}
-
-    Returns:
-        dict: A dictionary containing a list of successfully processed contacts
-              under the "detail" key.
-
-    Raises:
-        HTTPException: If the input string is not a valid JSON format.
+    Befriends every registered user found in the uploaded address book.
+    Numbers are normalized and de-duplicated in-process, then written in
+    chunks; the response is a summary of counts.
     """
-    
-    INDIAN_MOBILE_FORMAT_PATTERN = re.compile(r"^[6-9]\d{9}$")
-    processed_contacts = []
-
-    for entry in contacts.contacts:
-        # 2. Extract name and number, handling potential missing keys
-        name_raw = entry.name.strip()
-        number_raw = entry.number.strip()
-
-        # 3. Validate and clean name: Must be a non-empty string after stripping whitespace
-        if not isinstance(name_raw, str) or not name_raw.strip():
-            continue
-        name = name_raw.strip()
-
-        # 4. Validate and clean phone number: Must be a non-empty string after stripping whitespace
-        if not isinstance(number_raw, str) or not number_raw.strip():
-            continue
-
-        # Start with the raw number, stripped of leading/trailing whitespace
-        current_phone_number = number_raw.strip()
-        # 5. Remove '+91' prefix if present from the number *before* normalization for validation
-        if current_phone_number.startswith('+91'):
-            current_phone_number = current_phone_number[3:].strip() # Remove '+91' and strip any extra whitespace
-
-        # 6. Normalize phone number to digits only for validation and helpline check
-        normalized_phone_number = re.sub(r'\D', '', current_phone_number)
-
-        # 7. Validate phone number format (10 digits, starts with 6-9)
-        if not INDIAN_MOBILE_FORMAT_PATTERN.match(normalized_phone_number):
-            continue
-
-        current_phone_number = current_phone_number.replace(" ", "") 
-        # If all checks pass, add to the list of processed contacts
-        # The 'current_phone_number' now holds the cleaned 10-digit number without +91
-        processed_contacts.append({'name': name, 'number': current_phone_number})
-        # print(f"Successfully processed contact: Name='{name}', Number='{current_phone_number}'")
-    return {"detail": processed_contacts}
-
-@router.post("/import_contacts", status_code=status.HTTP_201_CREATED)
-def import_contacts(contact: ImportContactsRequest, user: user_dependency, db: Session = Depends(get_db)):
-    contacts = process_contact(contact)
+    numbers = normalize_contacts(contact.contacts)
     
     # save_contacts_query = """    MATCH (u:User {phone: $phone})
     # SET u.contact = $contacts
@@ -284,21 +278,22 @@ def import_contacts(contact: ImportContactsRequest, user: user_dependency, db: S
     #         detail=f"An internal server error occurred while saving contacts: {e}"
     #     )
     
-    create_contact_list = [
-        contact['number'] for contact in contacts['detail']
-    ]
-    create_contact_list.remove(user.phone) if user.phone in create_contact_list else None
-    create_friend(create_contact_list,user.phone,db)
-
-
-    return {"message": "Contacts processed successfully"}
+    create_contact_list = [number for number in numbers if number != user.phone]
+    summary = await create_friend(create_contact_list,user.phone,db)
+
+    return {
+        "message": "Contacts processed successfully",
+        "received": len(contact.contacts),
+        "valid_numbers": len(numbers),
+        **summary
+    }
     
 @router.post("/create_order", response_model=OrderCreationResponse, status_code=status.HTTP_201_CREATED, summary="Create a new order")
-def create_order_endpoint(order_data: List[int], user: user_dependency, db: Session = Depends(get_db)) -> OrderCreationResponse: 
+async def create_order_endpoint(order_data: List[int], user: user_dependency, db: AsyncSession = Depends(get_db)) -> OrderCreationResponse: 
     if not order_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Order data cannot be empty."
         )
 
-    return create_order_relation(order_data, user, db)
\ No newline at end of file
+    return await create_order_relation(order_data, user, db)
\ No newline at end of file
@@ -24,7 +24,8 @@ class UserBase(BaseModel):
     password: str
 
 class UserInDB(BaseModel):
-    user_id: str 
+    # Users created through /register have no user_id.
+    user_id: Optional[str] = None
     name: str
     phone: str
     email: EmailStr
@@ -37,6 +38,14 @@ class Product(BaseModel):
     price: float
     category_id: str
 
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+
+class UserPage(BaseModel):
+    items: List[UserInDB]
+    next_cursor: Optional[str] = None
+
 class Category(BaseModel):
     category_id: str
     name: str
@@ -82,7 +91,8 @@ class OrderStatusUpdate(BaseModel):
 
 class OrderInDB(BaseModel):
     order_id: str
-    user_id: str
+    # Users created through /register have no user_id.
+    user_id: Optional[str] = None
     username: str 
     order_date: datetime
     status: OrderStatus
@@ -90,6 +100,10 @@ class OrderInDB(BaseModel):
     items: List[OrderItemInDB]
 
 
+class OrderPage(BaseModel):
+    items: List[OrderInDB]
+    next_cursor: Optional[str] = None
+
 class OrderRequest(BaseModel):
     productId: List[str]
 
@@ -0,0 +1,36 @@
+import re
+from typing import Iterable, List, Protocol
+
+INDIAN_MOBILE_FORMAT_PATTERN = re.compile(r"^[6-9]\d{9}$")
+NON_DIGITS = re.compile(r"\D")
+
+
+class ContactLike(Protocol):
+    name: str
+    number: str
+
+
+def normalize_number(number: str) -> str:
+    """
+    Cleans one address-book number. Returns the number as it is stored on
+    User.phone (no +91 prefix, no spaces), or "" when it is not a valid
+    Indian mobile number (helplines, landlines, malformed entries).
+    """
+    number = number.strip()
+    if number.startswith("+91"):
+        number = number[3:].strip()
+    if not INDIAN_MOBILE_FORMAT_PATTERN.match(NON_DIGITS.sub("", number)):
+        return ""
+    return number.replace(" ", "")
+
+
+def normalize_contacts(contacts: Iterable[ContactLike]) -> List[str]:
+    """Valid, de-duplicated numbers from an address book, in first-seen order."""
+    numbers = {}
+    for entry in contacts:
+        if not entry.name.strip():
+            continue
+        number = normalize_number(entry.number)
+        if number:
+            numbers[number] = None
+    return list(numbers)
@@ -0,0 +1,134 @@
+"""
+Conditional GETs for catalog-derived responses.
+
+ETags come from a catalog version stored on a (:CatalogVersion) node, so
+every worker issues the same tag for the same catalog. on_catalog_change
+bumps it after each product/category write, and every worker polls it in
+the background every catalog_version_poll_interval seconds. If-None-Match is
+therefore answered without a database round trip, and a write made through
+another worker can be hidden behind a 304 for at most one poll interval.
+Callbacks registered with on_change run whenever the local copy advances, so
+per-process caches are dropped along with the tags they were served under.
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional
+from fastapi import Request, Response, status
+from neo4j import AsyncSession
+from config import Settings
+from database import session_scope
+
+settings = Settings()
+
+CATALOG_VERSION_QUERY = """
+MATCH (v:CatalogVersion {id: 'catalog'})
+RETURN v.version AS version
+"""
+
+BUMP_CATALOG_VERSION_QUERY = """
+MERGE (v:CatalogVersion {id: 'catalog'})
+SET v.version = coalesce(v.version, 0) + 1
+RETURN v.version AS version
+"""
+
+
+class CatalogVersion:
+    """Local copy of the shared catalog version. None until first loaded: no ETags are issued then."""
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self.value: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self.polls = 0
+        self.poll_failures = 0
+        self._listeners: List[Callable[[int], None]] = []
+
+    def on_change(self, callback: Callable[[int], None]):
+        """Calls `callback(version)` every time the version advances after the first load."""
+        self._listeners.append(callback)
+
+    def _observe(self, version: Optional[int]):
+        version = version or 0
+        # Never step back: a poll may race with a bump made by this worker.
+        if self.value is None or version > self.value:
+            changed = self.value is not None
+            self.value = version
+            if changed:
+                for callback in self._listeners:
+                    callback(version)
+
+    async def load(self, db: AsyncSession):
+        result = await db.run(CATALOG_VERSION_QUERY)
+        record = await result.single()
+        self._observe(record["version"] if record else 0)
+        self.polls += 1
+
+    async def bump(self):
+        async with session_scope() as session:
+            result = await session.run(BUMP_CATALOG_VERSION_QUERY)
+            record = await result.single()
+        self._observe(record["version"])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                async with session_scope() as session:
+                    await self.load(session)
+            except Exception as e:
+                self.poll_failures += 1
+                print(f"Error polling the catalog version: {e}")
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"version": self.value, "polls": self.polls, "poll_failures": self.poll_failures}
+
+
+catalog_version = CatalogVersion(settings.catalog_version_poll_interval)
+
+
+def catalog_etag(resource: str, version: Optional[int] = None) -> Optional[str]:
+    """
+    Strong ETag for a response that only depends on the catalog and the request URL.
+    Pass `version` when the body was built earlier, at a version that may since have moved.
+    """
+    if version is None:
+        version = catalog_version.value
+    if version is None:
+        return None
+    return f'"{resource}-{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+def cache_headers(etag: Optional[str], cache_control: str) -> Dict[str, str]:
+    headers = {"Cache-Control": cache_control}
+    if etag is not None:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(request: Request, response: Response, etag: Optional[str], cache_control: str) -> Optional[Response]:
+    """
+    Sets ETag and Cache-Control on `response`. Returns a 304 to send instead
+    when the client already holds this version, otherwise None.
+    """
+    headers = cache_headers(etag, cache_control)
+    if etag is not None and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
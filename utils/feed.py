@@ -0,0 +1,172 @@
+import asyncio
+from typing import Iterable, List, Optional, Tuple
+from neo4j import AsyncSession
+from config import Settings
+from database import session_scope
+from utils.cache import TTLCache
+from utils.etag import catalog_version
+from utils.responses import dumps
+
+settings = Settings()
+
+# Home page payloads keyed by the viewer's phone. Entries are dropped when
+# someone in the viewer's neighbourhood orders or the catalog changes; the TTL
+# bounds staleness for changes made through another worker process.
+home_feed_cache = TTLCache(maxsize=settings.home_feed_cache_size, ttl=settings.home_feed_max_staleness)
+
+# Stored in home_feed_cache for viewers without network activity, who all get
+# the shared cold-start payload below.
+COLD_START = object()
+
+# Everyone whose NETWORK contains one of the given users, plus those users.
+NEIGHBOURHOOD_VIEWERS_QUERY = """
+UNWIND $emails AS email
+MATCH (buyer:User {email: email})
+OPTIONAL MATCH (viewer:User)-[:NETWORK]->(buyer)
+WITH buyer, collect(viewer.phone) AS viewers
+UNWIND viewers + [buyer.phone] AS phone
+RETURN collect(DISTINCT phone) AS phones
+"""
+
+COLD_START_CATEGORIES_QUERY = """
+MATCH (c:Product)
+WITH DISTINCT c.productCategory AS category
+ORDER BY category // Important for deterministic LIMIT 5
+LIMIT 5 // Select up to 5 categories to process further
+
+CALL {
+    WITH category
+    MATCH (p:Product)
+    WHERE p.productCategory = category
+    WITH category, COLLECT(p) AS allProducts
+    WHERE size(allProducts) > 0 // Ensure the category has at least 1 product
+    RETURN category AS filteredCategory, allProducts[0..14] AS products // Slice to max 15
+}
+WITH filteredCategory, products
+WHERE filteredCategory IS NOT NULL
+ORDER BY filteredCategory
+
+UNWIND products AS product
+RETURN filteredCategory AS category, properties(product) AS product, ID(product) AS product_id
+ORDER BY category, product.name
+"""
+
+COLD_START_COVER_QUERY = """
+MATCH (p:Product) RETURN p LIMIT 5;
+"""
+
+
+def invalidate_home_feeds(phones: Iterable[str]):
+    for phone in phones:
+        home_feed_cache.pop(phone)
+
+
+async def invalidate_feeds_for_buyers(db: AsyncSession, emails: List[str]):
+    """Called after ORDERS edges are written for these users."""
+    result = await db.run(NEIGHBOURHOOD_VIEWERS_QUERY, emails=emails)
+    record = await result.single()
+    if record:
+        invalidate_home_feeds(record["phones"])
+
+
+async def build_cold_start_feed(db: AsyncSession) -> bytes:
+    """Home page for users whose network has no orders; the same for all of them."""
+    categories = {}
+    result = await db.run(COLD_START_CATEGORIES_QUERY)
+    for item in await result.data():
+        categories.setdefault(item['category'], []).append(item['product'])
+
+    result = await db.run(COLD_START_COVER_QUERY)
+    cover_products_list = [cover_product['p'] for cover_product in await result.data()]
+    feed = {
+        "categories": categories,
+        "cover_products": cover_products_list
+    }
+    return dumps(feed)
+
+
+class ColdStartFeed:
+    """Serialized cold-start home page, rebuilt whenever the shared catalog version advances."""
+
+    def __init__(self):
+        self.body: Optional[bytes] = None
+        # Catalog version the body was built at; its ETag is derived from this, not the live version.
+        self.version: Optional[int] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    async def get_versioned(self, db: AsyncSession) -> Tuple[bytes, Optional[int]]:
+        if self.body is None:
+            async with self._lock:
+                if self.body is None:
+                    generation = self._generation
+                    version = catalog_version.value
+                    body = await build_cold_start_feed(db)
+                    # A catalog write that landed mid-build makes this body stale.
+                    if generation == self._generation:
+                        self.body, self.version = body, version
+                    return body, version
+        return self.body, self.version
+
+    async def get(self, db: AsyncSession) -> bytes:
+        body, _ = await self.get_versioned(db)
+        return body
+
+    def invalidate(self):
+        self._generation += 1
+        self.body = None
+        self.version = None
+
+
+cold_start_feed = ColdStartFeed()
+_background_tasks = set()
+
+
+async def refresh_cold_start_feed():
+    try:
+        async with session_scope() as session:
+            await cold_start_feed.get(session)
+    except Exception as e:
+        # The next cold-start request rebuilds it instead.
+        print(f"Error building cold-start home feed: {e}")
+
+
+def _spawn(coroutine):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coroutine.close()
+        return
+    task = loop.create_task(coroutine)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def on_catalog_change():
+    """
+    Products or categories were written: every cached feed may be stale.
+    The cold-start body is rebuilt once the shared version has been bumped.
+    """
+    home_feed_cache.clear()
+    cold_start_feed.invalidate()
+    _spawn(_bump_catalog_version())
+
+
+def _on_catalog_version_change(version: int):
+    # Runs for this worker's bumps and for versions polled from other workers
+    # or the CLI ingest, so every process rebuilds the cold-start page.
+    home_feed_cache.clear()
+    cold_start_feed.invalidate()
+    _spawn(refresh_cold_start_feed())
+
+
+catalog_version.on_change(_on_catalog_version_change)
+
+
+async def _bump_catalog_version():
+    try:
+        await catalog_version.bump()
+    except Exception as e:
+        # Clients keep revalidating against the old ETag until the next catalog write.
+        print(f"Error bumping the catalog version: {e}")
+        await refresh_cold_start_feed()
@@ -0,0 +1,121 @@
+"""
+Idempotent Neo4j schema bootstrap.
+
+Creates the uniqueness constraints and range indexes behind every property
+lookup in the code base. Runs from the app lifespan, and as a CLI that also
+prints which queries each entry serves:
+
+    python -m utils.graph_schema
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import List
+from neo4j import AsyncSession
+
+
+@dataclass(frozen=True)
+class SchemaItem:
+    name: str
+    statement: str
+    serves: str
+
+
+SCHEMA: List[SchemaItem] = [
+    SchemaItem(
+        "user_email_unique",
+        "CREATE CONSTRAINT user_email_unique IF NOT EXISTS FOR (u:User) REQUIRE u.email IS UNIQUE",
+        "login, register, verify_jwt_token, get_current_user, create_order_relation, get_all_users (keyset)",
+    ),
+    SchemaItem(
+        "user_id_unique",
+        "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.user_id IS UNIQUE",
+        "get_user, delete_user_endpoint, get_user_contacts_endpoint, create_order",
+    ),
+    # Phone is not unique at registration time, so it only gets a range index.
+    SchemaItem(
+        "user_phone",
+        "CREATE INDEX user_phone IF NOT EXISTS FOR (u:User) ON (u.phone)",
+        "home, get_product, suggest_products, create_friend, utils.network",
+    ),
+    SchemaItem(
+        "product_id_unique",
+        "CREATE CONSTRAINT product_id_unique IF NOT EXISTS FOR (p:Product) REQUIRE p.productId IS UNIQUE",
+        "get_product, get_similar_products, suggest_products, create_order_relation",
+    ),
+    SchemaItem(
+        "product_category",
+        "CREATE INDEX product_category IF NOT EXISTS FOR (p:Product) ON (p.productCategory)",
+        "home (network categories), cold-start feed, suggest_products (same category)",
+    ),
+    SchemaItem(
+        "product_brand",
+        "CREATE INDEX product_brand IF NOT EXISTS FOR (p:Product) ON (p.productBrand)",
+        "get_product (same brand), suggest_products (same brand)",
+    ),
+    SchemaItem(
+        "product_name",
+        "CREATE INDEX product_name IF NOT EXISTS FOR (p:Product) ON (p.name)",
+        "create_product_endpoint (duplicate name check)",
+    ),
+    SchemaItem(
+        "product_category_id",
+        "CREATE INDEX product_category_id IF NOT EXISTS FOR (p:Product) ON (p.category_id)",
+        "get_similar_products",
+    ),
+    SchemaItem(
+        "order_id_unique",
+        "CREATE CONSTRAINT order_id_unique IF NOT EXISTS FOR (o:Order) REQUIRE o.order_id IS UNIQUE",
+        "get_order_details, update_order_status",
+    ),
+    SchemaItem(
+        "category_id_unique",
+        "CREATE CONSTRAINT category_id_unique IF NOT EXISTS FOR (c:Category) REQUIRE c.category_id IS UNIQUE",
+        "delete_category, add_products_to_category",
+    ),
+    SchemaItem(
+        "catalog_version_id_unique",
+        "CREATE CONSTRAINT catalog_version_id_unique IF NOT EXISTS FOR (v:CatalogVersion) REQUIRE v.id IS UNIQUE",
+        "utils.etag (catalog ETags)",
+    ),
+    SchemaItem(
+        "phone_directory_version_id_unique",
+        "CREATE CONSTRAINT phone_directory_version_id_unique IF NOT EXISTS FOR (v:PhoneDirectoryVersion) REQUIRE v.id IS UNIQUE",
+        "utils.phones (registered phone filter)",
+    ),
+    SchemaItem(
+        "category_name",
+        "CREATE INDEX category_name IF NOT EXISTS FOR (c:Category) ON (c.name)",
+        "create_category (duplicate name check)",
+    ),
+]
+
+
+async def ensure_schema(db: AsyncSession) -> List[dict]:
+    """
+    Applies every SchemaItem. A failing item (e.g. duplicates blocking a
+    uniqueness constraint) is reported and does not stop the others.
+    """
+    report = []
+    for item in SCHEMA:
+        try:
+            result = await db.run(item.statement)
+            summary = await result.consume()
+            added = summary.counters.indexes_added + summary.counters.constraints_added
+            report.append({"name": item.name, "status": "created" if added else "exists", "serves": item.serves})
+        except Exception as e:
+            print(f"Error applying schema item {item.name}: {e}")
+            report.append({"name": item.name, "status": f"failed: {e}", "serves": item.serves})
+    return report
+
+
+async def _main():
+    from database import session_scope, close_driver
+    async with session_scope() as session:
+        report = await ensure_schema(session)
+    await close_driver()
+    for entry in report:
+        print(f"{entry['name']:<22} {entry['status']:<8} {entry['serves']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
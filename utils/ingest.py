@@ -0,0 +1,139 @@
+"""
+Bulk product ingestion from CSV or NDJSON.
+
+Rows are validated with schemas.schema.Product and written in UNWIND
+batches that MERGE on the unique productId, one write transaction per
+batch. Used by POST /products/bulk and runnable offline:
+
+    python -m utils.ingest catalog.csv --batch-size 2000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from neo4j import AsyncSession, AsyncManagedTransaction
+from pydantic import ValidationError
+from schemas.schema import Product
+
+MERGE_PRODUCTS_QUERY = """
+UNWIND $rows AS row
+MERGE (p:Product {productId: row.productId})
+SET p += row
+"""
+
+# Report at most this many row errors; the counts stay exact.
+MAX_REPORTED_ERRORS = 1000
+
+SCALARS = (str, int, float, bool)
+
+
+def detect_format(filename: str, content_type: str = "") -> str:
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return "ndjson"
+    return "csv"
+
+
+def read_rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yields (line number, raw row). Unparseable NDJSON lines yield the exception instead of a row."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+
+def to_properties(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Validated Product fields plus any extra scalar columns (productBrand, productCategory, ...)."""
+    product = Product(**raw)
+    extras = {
+        key: value for key, value in raw.items()
+        if key and isinstance(value, SCALARS) and value != ""
+    }
+    return {**extras, **product.model_dump()}
+
+
+async def _merge_batch(tx: AsyncManagedTransaction, rows: List[Dict[str, Any]]) -> int:
+    result = await tx.run(MERGE_PRODUCTS_QUERY, rows=rows)
+    summary = await result.consume()
+    return summary.counters.nodes_created
+
+
+async def ingest_products(db: AsyncSession, rows: Iterable[Tuple[int, Any]], batch_size: int = 1000) -> Dict[str, Any]:
+    started = time.perf_counter()
+    report = {"received": 0, "created": 0, "updated": 0, "failed": 0, "errors": []}
+
+    def fail(line_no, error):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": line_no, "error": error})
+
+    async def flush(batch):
+        try:
+            created = await db.execute_write(_merge_batch, [properties for _, properties in batch])
+        except Exception as e:
+            for line_no, _ in batch:
+                fail(line_no, f"batch write failed: {e}")
+            return
+        report["created"] += created
+        report["updated"] += len(batch) - created
+
+    batch = []
+    for line_no, raw in rows:
+        report["received"] += 1
+        if isinstance(raw, Exception):
+            fail(line_no, f"invalid JSON: {raw}")
+            continue
+        if not isinstance(raw, dict):
+            fail(line_no, "expected an object")
+            continue
+        try:
+            batch.append((line_no, to_properties(raw)))
+        except ValidationError as e:
+            fail(line_no, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["received"] / elapsed, 1) if elapsed else None
+    return report
+
+
+async def _main():
+    from database import session_scope, close_driver
+    from utils.etag import catalog_version
+    parser = argparse.ArgumentParser(description="Bulk load products from a CSV or NDJSON file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    with open(args.path, encoding="utf-8", newline="") as f:
+        async with session_scope() as session:
+            report = await ingest_products(session, read_rows(f, fmt), args.batch_size)
+    if report["created"] or report["updated"]:
+        # Invalidates the catalog ETags the API workers hand out.
+        await catalog_version.bump()
+    await close_driver()
+    errors = report.pop("errors")
+    for error in errors:
+        print(f"row {error['row']}: {error['error']}")
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,73 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, Any, Optional
+
+
+class Histogram:
+    """Fixed-bucket histogram, cumulative like Prometheus buckets."""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = self.count
+        return {"buckets": cumulative, "count": self.count, "sum": self.sum}
+
+
+# Seconds per driver call or connection checkout, up to the default 60s acquisition timeout.
+CALL_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class PoolMetrics:
+    """
+    Driver calls in flight and their latency, and the wait for a pooled
+    connection on its own. Connection counts come from the pool itself.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls_total = 0
+        self.acquisition_timeouts = 0
+        self.call_seconds = Histogram(CALL_BUCKETS)
+        self.acquisition_seconds = Histogram(CALL_BUCKETS)
+
+    def started(self):
+        self.in_flight += 1
+        self.calls_total += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, seconds: float):
+        self.in_flight -= 1
+        self.call_seconds.observe(seconds)
+
+    def acquired(self, seconds: float):
+        self.acquisition_seconds.observe(seconds)
+
+    def timed_out(self):
+        self.acquisition_timeouts += 1
+
+    def snapshot(self, connections: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        return {
+            "max_size": self.max_size,
+            "connections": connections,
+            "calls_in_flight": self.in_flight,
+            "peak_calls_in_flight": self.peak_in_flight,
+            "calls_total": self.calls_total,
+            "acquisition_timeouts": self.acquisition_timeouts,
+            "call_seconds": self.call_seconds.snapshot(),
+            "acquisition_seconds": self.acquisition_seconds.snapshot(),
+        }
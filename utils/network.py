@@ -0,0 +1,121 @@
+"""
+Materialized social neighbourhood.
+
+Every user keeps (u)-[:NETWORK {relation: 'direct' | 'fof'}]->(person) edges
+mirroring the friends / friends-of-friends expansion the read endpoints used
+to run per request. New friendships only MERGE the edges they add
+(extend_network); removing a user rebuilds the neighbourhoods that lost them.
+
+Users with friends but no NETWORK edges (a graph that predates this) are
+backfilled at startup. A full rebuild can be run with:
+
+    python -m utils.network
+"""
+import asyncio
+from typing import Iterable, List
+from neo4j import AsyncSession, AsyncManagedTransaction
+
+# Mirrors the old per-request expansion: a person appears once per relation,
+# so someone who is both a friend and a friend-of-friend has two edges.
+REFRESH_NETWORK_QUERY = """
+UNWIND $phones AS phone
+MATCH (u:User {phone: phone})
+OPTIONAL MATCH (u)-[old:NETWORK]->()
+DELETE old
+WITH DISTINCT u
+CALL (u) {
+    MATCH (u)-[:FRIEND]->(f:User)
+    WHERE f <> u
+    RETURN f AS person, 'direct' AS relation
+    UNION
+    MATCH (u)-[:FRIEND]->(:User)-[:FRIEND]->(fof:User)
+    WHERE fof <> u
+    RETURN fof AS person, 'fof' AS relation
+}
+MERGE (u)-[:NETWORK {relation: relation}]->(person)
+"""
+
+# New FRIEND edges x->y only add paths of length <= 2 that use them:
+# x->y (direct), x->y->z (fof) and p->x->y (fof). The MERGEs make repeats no-ops.
+EXTEND_NETWORK_QUERY = """
+MATCH (x:User {phone: $phone})
+UNWIND $added AS addedPhone
+MATCH (y:User {phone: addedPhone})
+WHERE y <> x
+MERGE (x)-[:NETWORK {relation: 'direct'}]->(y)
+WITH x, y
+CALL (x, y) {
+    MATCH (y)-[:FRIEND]->(z:User)
+    WHERE z <> x
+    MERGE (x)-[:NETWORK {relation: 'fof'}]->(z)
+}
+CALL (x, y) {
+    MATCH (p:User)-[:FRIEND]->(x)
+    WHERE p <> y
+    MERGE (p)-[:NETWORK {relation: 'fof'}]->(y)
+}
+"""
+
+# Users with friends whose neighbourhood was never materialized.
+MISSING_NETWORK_QUERY = """
+MATCH (u:User)
+WHERE u.phone IS NOT NULL AND (u)-[:FRIEND]->() AND NOT (u)-[:NETWORK]->()
+RETURN u.phone AS phone
+"""
+
+# Users whose neighbourhood depends on the FRIEND edges of the given users.
+DEPENDENT_USERS_QUERY = """
+UNWIND $phones AS phone
+MATCH (p:User)-[:FRIEND]->(:User {phone: phone})
+RETURN collect(DISTINCT p.phone) AS phones
+"""
+
+REFRESH_BATCH_SIZE = 500
+
+
+async def refresh_network(db: AsyncSession, phones: Iterable[str]):
+    phones = list(dict.fromkeys(phones))
+    for start in range(0, len(phones), REFRESH_BATCH_SIZE):
+        result = await db.run(REFRESH_NETWORK_QUERY, phones=phones[start:start + REFRESH_BATCH_SIZE])
+        await result.consume()
+
+
+async def get_dependent_users(db: AsyncSession, phones: Iterable[str]) -> List[str]:
+    result = await db.run(DEPENDENT_USERS_QUERY, phones=list(phones))
+    record = await result.single()
+    return record["phones"] if record else []
+
+
+async def extend_network(tx: AsyncManagedTransaction, phone: str, added: List[str]):
+    """The user with `phone` just befriended `added`; MERGEs only the NETWORK edges that creates."""
+    if not added:
+        return
+    result = await tx.run(EXTEND_NETWORK_QUERY, phone=phone, added=added)
+    await result.consume()
+
+
+async def backfill_missing(db: AsyncSession) -> int:
+    """Materializes NETWORK for users that have friends but none yet. A no-op once backfilled."""
+    result = await db.run(MISSING_NETWORK_QUERY)
+    phones = [record["phone"] async for record in result]
+    await refresh_network(db, phones)
+    return len(phones)
+
+
+async def rebuild_all(db: AsyncSession):
+    result = await db.run("MATCH (u:User) WHERE u.phone IS NOT NULL RETURN u.phone AS phone")
+    phones = [record["phone"] async for record in result]
+    await refresh_network(db, phones)
+    return len(phones)
+
+
+async def _main():
+    from database import driver, close_driver
+    async with driver.session() as session:
+        count = await rebuild_all(session)
+    await close_driver()
+    print(f"Rebuilt social neighbourhood for {count} users.")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
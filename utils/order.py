@@ -1,5 +1,5 @@
-from neo4j import AsyncSession
-from typing import List, Dict, Any, Optional
+from neo4j import AsyncSession, AsyncManagedTransaction
+from typing import List, Optional, Tuple
 from uuid import uuid4
 from datetime import datetime
 
@@ -7,82 +7,89 @@ from schemas.schema import (
  OrderItemInDB, OrderCreate, OrderInDB, OrderStatus, OrderItemCreateRequest
 )
 
-from router.user import get_user
-from router.product import get_product
-
-async def create_order(session: AsyncSession, order_data: OrderCreate) -> Optional[OrderInDB]:
-    order_id = str(uuid4())
-    order_date = datetime.now()
-    status = OrderStatus.PENDING
-
-    user = await get_user(session, order_data.user_id)
-    if not user:
-        raise ValueError(f"User with ID '{order_data.user_id}' not found.")
-
-    username_for_order = user.name # Using user's name from UserInDB as username
+from utils.product import get_products_by_ids
+
+CREATE_ORDER_QUERY = """
+MATCH (u:User {user_id: $user_id})
+CREATE (o:Order {
+    order_id: $order_id,
+    order_date: datetime($order_date),
+    status: $status,
+    total_amount: $total_amount
+})
+CREATE (u)-[:PLACES]->(o)
+WITH u, o, $products_in_order AS products_data
+UNWIND products_data AS item_data
+MATCH (p:Product {productId: item_data.productId})
+CREATE (o)-[r:CONTAINS {
+    quantity: item_data.quantity,
+    price_at_order: item_data.price_at_order
+}]->(p)
+RETURN o.order_id AS order_id,
+       u.user_id AS user_id,
+       u.name AS username,
+       o.order_date AS order_date,
+       o.status AS status,
+       o.total_amount AS total_amount,
+       COLLECT({
+           productId: p.productId,
+           product_name: p.name,
+           product_price_at_order: r.price_at_order,
+           quantity: r.quantity
+       }) AS items
+"""
+
+async def _create_order_tx(tx: AsyncManagedTransaction, order_data: OrderCreate, order_id: str, order_date: datetime, status: OrderStatus):
+    # One multi-get for every line item instead of a lookup per line.
+    products, missing = await get_products_by_ids(tx, [item_req.productId for item_req in order_data.items])
+    if missing:
+        raise ValueError(f"Products not found: {', '.join(map(str, missing))}.")
 
     total_amount = 0.0
     products_in_order = []
 
     for item_req in order_data.items:
-        product = await get_product(session, item_req.product_id)
-        if not product:
-            raise ValueError(f"Product with ID '{item_req.product_id}' not found.")
-
-        item_price_at_order = product.price
+        product = products[item_req.productId]
+        item_price_at_order = product["price"]
         total_amount += item_price_at_order * item_req.quantity
 
         products_in_order.append({
-            "id": product.product_id,
-            "name": product.name,
+            "productId": product["productId"],
             "quantity": item_req.quantity,
             "price_at_order": item_price_at_order
         })
 
-    query = """
-    MATCH (u:User {user_id: $user_id})
-    CREATE (o:Order {
-        order_id: $order_id,
-        order_date: datetime($order_date),
-        status: $status,
-        total_amount: $total_amount
-    })
-    CREATE (u)-[:PLACES]->(o)
-    WITH o, $products_in_order AS products_data
-    UNWIND products_data AS item_data
-    MATCH (p:Product {product_id: item_data.id})
-    CREATE (o)-[r:CONTAINS {
-        quantity: item_data.quantity,
-        price_at_order: item_data.price_at_order
-    }]->(p)
-    RETURN o.order_id AS order_id,
-           u.user_id AS user_id,
-           u.name AS username,
-           o.order_date AS order_date,
-           o.status AS status,
-           o.total_amount AS total_amount,
-           COLLECT({
-               product_id: p.product_id,
-               product_name: p.name,
-               product_price_at_order: r.price_at_order,
-               quantity: r.quantity
-           }) AS items
-    """
-    result = await session.run(query,
-                               order_id=order_id,
-                               user_id=order_data.user_id,
-                               order_date=order_date,
-                               status=status.value,
-                               total_amount=total_amount,
-                               products_in_order=products_in_order)
+    result = await tx.run(CREATE_ORDER_QUERY,
+                          order_id=order_id,
+                          user_id=order_data.user_id,
+                          order_date=order_date.isoformat(),
+                          status=status.value,
+                          total_amount=total_amount,
+                          products_in_order=products_in_order)
     record = await result.single()
+    # Every product exists, so no row means the user MATCH failed. Raising rolls the order back.
+    if record is None and products_in_order:
+        raise ValueError(f"User with ID '{order_data.user_id}' not found.")
+    return record
+
+async def create_order(session: AsyncSession, order_data: OrderCreate) -> Optional[OrderInDB]:
+    """
+    Looks up all line items, then writes the order, in a single write
+    transaction (two round trips). A missing product or user aborts it with
+    nothing written.
+    """
+    order_id = str(uuid4())
+    order_date = datetime.now()
+    status = OrderStatus.PENDING
+
+    record = await session.execute_write(_create_order_tx, order_data, order_id, order_date, status)
 
     if record:
         return OrderInDB(
             order_id=record["order_id"],
             user_id=record["user_id"],
             username=record["username"],
-            order_date=record["order_date"],
+            order_date=record["order_date"].to_native(),
             status=OrderStatus(record["status"]),
             total_amount=record["total_amount"],
             items=[OrderItemInDB(**item) for item in record["items"]]
@@ -120,46 +127,79 @@ async def get_order_details(session: AsyncSession, order_id: str) -> Optional[Or
         )
     return None
 
-async def get_orders_by_user(session: AsyncSession, user_id: str) -> List[OrderInDB]:
-    query = """
-    MATCH (u:User {user_id: $user_id})-[:PLACES]->(o:Order)-[r:CONTAINS]->(p:Product)
-    RETURN o.order_id AS order_id,
-           u.user_id AS user_id,
-           u.name AS username,
-           o.order_date AS order_date,
-           o.status AS status,
-           o.total_amount AS total_amount,
-           COLLECT({
-               product_id: p.product_id,
+ORDER_HISTORY_QUERY = """
+MATCH (u:User {{email: $email}})-[:PLACES]->(o:Order)
+WHERE {predicate}
+WITH u, o
+ORDER BY o.order_date DESC, o.order_id DESC
+LIMIT $limit
+RETURN o.order_id AS order_id,
+       u.user_id AS user_id,
+       u.name AS username,
+       o.order_date AS order_date,
+       o.status AS status,
+       o.total_amount AS total_amount,
+       COLLECT {{
+           MATCH (o)-[r:CONTAINS]->(p:Product)
+           RETURN {{
+               productId: p.productId,
                product_name: p.name,
                product_price_at_order: r.price_at_order,
                quantity: r.quantity
-           }) AS items
-    ORDER BY o.order_date DESC
+           }}
+       }} AS items
+"""
+
+async def get_orders_by_user(
+    session: AsyncSession,
+    email: str,
+    limit: int,
+    after: Optional[Tuple[str, str]] = None,
+    status: Optional[OrderStatus] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> List[OrderInDB]:
     """
-    result = await session.run(query, user_id=user_id)
+    One page of a user's orders, newest first. `after` is the
+    (order_date, order_id) of the last order already served; filters and
+    the keyset are applied in the query, so only `limit` orders are read
+    back and their items are collected per order by Cypher.
+    """
+    predicates = ["o.order_date IS NOT NULL"]
+    if after is not None:
+        predicates.append(
+            "(o.order_date < datetime($after_date) OR "
+            "(o.order_date = datetime($after_date) AND o.order_id < $after_id))"
+        )
+    if status is not None:
+        predicates.append("o.status = $status")
+    if date_from is not None:
+        predicates.append("o.order_date >= datetime($date_from)")
+    if date_to is not None:
+        predicates.append("o.order_date < datetime($date_to)")
+
+    result = await session.run(
+        ORDER_HISTORY_QUERY.format(predicate=" AND ".join(predicates)),
+        email=email,
+        limit=limit,
+        after_date=after[0] if after else None,
+        after_id=after[1] if after else None,
+        status=status.value if status else None,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=date_to.isoformat() if date_to else None,
+    )
     orders = []
-    grouped_orders: Dict[str, Dict[str, Any]] = {}
-
     async for record in result:
-        order_id = record["order_id"]
-        if order_id not in grouped_orders:
-            grouped_orders[order_id] = {
-                "order_id": order_id,
-                "user_id": record["user_id"],
-                "username": record["username"],
-                "order_date": record["order_date"],
-                "status": OrderStatus(record["status"]),
-                "total_amount": record["total_amount"],
-                "items": []
-            }
-        for item in record["items"]:
-            grouped_orders[order_id]["items"].append(OrderItemInDB(**item))
-
-    for order_data in grouped_orders.values():
-        orders.append(OrderInDB(**order_data))
-
-    return sorted(orders, key=lambda o: o.order_date, reverse=True)
+        orders.append(OrderInDB(
+            order_id=record["order_id"],
+            user_id=record["user_id"],
+            username=record["username"],
+            order_date=record["order_date"].to_native(),
+            status=OrderStatus(record["status"]),
+            total_amount=record["total_amount"],
+            items=[OrderItemInDB(**item) for item in record["items"]]
+        ))
+    return orders
 
 async def update_order_status(session: AsyncSession, order_id: str, new_status: OrderStatus) -> Optional[OrderInDB]:
     query = """
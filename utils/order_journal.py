@@ -0,0 +1,312 @@
+"""
+Write-behind journal for ORDERS edges.
+
+With order_write_behind enabled, a checkout is acknowledged once its edges
+are appended (and fsynced) to a local NDJSON journal. A background task
+flushes queued edges to Neo4j in UNWIND batches when
+order_flush_batch_size edges are waiting or every order_flush_interval
+seconds. Every edge carries an order_key and is MERGEd on it, so a batch
+replayed after a crash does not create duplicates.
+
+Each worker process journals to its own segment files in order_journal_dir
+and holds an flock on its orders-<pid>.lock file. At startup, journals whose
+lock nobody holds (their worker is gone) are taken over and replayed.
+
+Flush lag is bounded: once the oldest queued edge is older than
+order_flush_max_lag seconds, or order_journal_max_pending edges are queued,
+checkouts wait for a flush before they are acknowledged.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from neo4j import AsyncManagedTransaction
+from config import Settings
+from database import session_scope
+from utils.feed import invalidate_feeds_for_buyers
+
+settings = Settings()
+
+FLUSH_ORDERS_QUERY = """
+UNWIND $rows AS row
+MATCH (u:User {email: row.email})
+MATCH (p:Product {productId: row.productId})
+MERGE (u)-[r:ORDERS {order_key: row.order_key}]->(p)
+ON CREATE SET r.timestamp = row.timestamp
+"""
+
+
+async def _write_batch(tx: AsyncManagedTransaction, rows: List[Dict[str, Any]]) -> int:
+    result = await tx.run(FLUSH_ORDERS_QUERY, rows=rows)
+    summary = await result.consume()
+    return summary.counters.relationships_created
+
+
+def _read_rows(f) -> List[Dict[str, Any]]:
+    f.seek(0)
+    rows = []
+    for line_no, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            # A torn final line from a crash mid-append; that checkout was never acknowledged.
+            print(f"Skipping unreadable order journal line {line_no} in {f.name}")
+    return rows
+
+
+def _still_linked(f, path: str) -> bool:
+    try:
+        return os.path.samestat(os.fstat(f.fileno()), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+class OrderJournal:
+    def __init__(self, directory: str, batch_size: int, interval: float, max_lag: float, max_pending: int):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_lag = max_lag
+        self.max_pending = max_pending
+        # Set in start(): under `gunicorn --preload` the module is imported before the workers fork.
+        self.owner: Optional[str] = None
+        self._lock_file = None
+        self._file = None
+        self._seq = 0
+        self._active_rows = 0
+        self._segments: Dict[int, str] = {}
+        # (enqueued at, segment seq, edge)
+        self._pending: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._io_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.replayed = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.backpressure_waits = 0
+
+    # File handling. Blocking calls run in a worker thread.
+    #
+    # The journal is a series of segments, orders-<pid>.<seq>.ndjson, rolled
+    # every batch_size edges. A flush deletes the segments it fully drained,
+    # so appends never wait on the journal being rewritten. Edges of a
+    # partly drained segment are replayed after a crash and MERGE away.
+
+    def _segment_path(self, owner: str, seq: int) -> str:
+        return os.path.join(self.directory, f"{owner}.{seq:08d}.ndjson")
+
+    def _open_locked(self, path: str, mode: str):
+        f = open(path, mode, encoding="utf-8")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.close()
+        self._seq += 1
+        path = self._segment_path(self.owner, self._seq)
+        self._file = open(path, "a", encoding="utf-8")
+        self._segments[self._seq] = path
+        self._active_rows = 0
+
+    def _write(self, lines: str):
+        self._file.write(lines)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _append_lines(self, lines: str, count: int):
+        self._write(lines)
+        self._active_rows += count
+        if self._active_rows >= self.batch_size:
+            self._roll()
+
+    def _drop_segments(self, oldest_live: Optional[int]):
+        """Deletes segments holding no queued edge. `oldest_live` is the segment of the oldest queued one."""
+        if oldest_live is None:
+            if self._active_rows:
+                self._roll()
+            oldest_live = self._seq
+        for seq in sorted(self._segments):
+            if seq >= oldest_live:
+                break
+            os.remove(self._segments.pop(seq))
+
+    def _segments_of(self, owner: str) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            prefix, _, rest = name.partition(".")
+            seq, _, ext = rest.partition(".")
+            if prefix == owner and ext == "ndjson" and seq.isdigit():
+                segments.append((int(seq), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _take_over(self) -> List[Dict[str, Any]]:
+        """Locks this worker's journal and adopts unowned ones. Returns every edge found."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = self._open_locked(os.path.join(self.directory, f"{self.owner}.lock"), "a")
+        rows = []
+        adopted = []
+        orphan_locks = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".lock"):
+                continue
+            owner = name[:-len(".lock")]
+            path = os.path.join(self.directory, name)
+            # A restarted container often gets the same pid back, so our own segments may hold edges too.
+            if owner != self.owner:
+                try:
+                    orphan_lock = self._open_locked(path, "a")
+                except (BlockingIOError, FileNotFoundError):
+                    continue  # owned by a live worker, or already taken over by one starting alongside us
+                if not _still_linked(orphan_lock, path):
+                    orphan_lock.close()  # taken over and removed between our open() and flock()
+                    continue
+                orphan_locks.append((orphan_lock, path))
+            for seq, segment in self._segments_of(owner):
+                try:
+                    with open(segment, encoding="utf-8") as f:
+                        rows.extend(_read_rows(f))
+                except FileNotFoundError:
+                    continue
+                adopted.append(segment)
+                if owner == self.owner:
+                    self._seq = max(self._seq, seq)
+
+        self._roll()
+        if rows:
+            # Copy into a segment of ours before deleting, so the edges are never only in memory.
+            # One segment regardless of size, so every replayed edge belongs to self._seq.
+            self._write("".join(json.dumps(row) + "\n" for row in rows))
+            self._active_rows = len(rows)
+        for segment in adopted:
+            os.remove(segment)
+        for orphan_lock, path in orphan_locks:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            orphan_lock.close()
+        return rows
+
+    # Lifecycle
+
+    async def start(self):
+        self.owner = f"orders-{os.getpid()}"
+        rows = await asyncio.to_thread(self._take_over)
+        now = time.monotonic()
+        self._pending.extend((now, self._seq, row) for row in rows)
+        self.replayed += len(rows)
+        if rows:
+            print(f"Replaying {len(rows)} journaled order edge(s)")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            while self._pending:
+                await self.flush()
+        except Exception as e:
+            print(f"Order journal not fully flushed at shutdown, it will be replayed: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    # Write path
+
+    def lag(self) -> float:
+        return time.monotonic() - self._pending[0][0] if self._pending else 0.0
+
+    def _over_bound(self) -> bool:
+        return len(self._pending) >= self.max_pending or self.lag() > self.max_lag
+
+    async def append(self, rows: List[Dict[str, Any]]):
+        """Durably queues edges. Raises if the lag bound cannot be met because flushes fail."""
+        if self._over_bound():
+            self.backpressure_waits += 1
+            while self._over_bound():
+                await self.flush()
+        lines = "".join(json.dumps(row) + "\n" for row in rows)
+        async with self._io_lock:
+            seq = self._seq
+            await asyncio.to_thread(self._append_lines, lines, len(rows))
+            now = time.monotonic()
+            self._pending.extend((now, seq, row) for row in rows)
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Writes the oldest batch of queued edges to Neo4j and deletes the segments it drained."""
+        async with self._flush_lock:
+            batch = [row for _, _, row in self._pending[:self.batch_size]]
+            if not batch:
+                return 0
+            try:
+                async with session_scope() as session:
+                    await session.execute_write(_write_batch, batch)
+                    # Appends only ever add to the end, so the batch is still the prefix.
+                    async with self._io_lock:
+                        del self._pending[:len(batch)]
+                        oldest_live = self._pending[0][1] if self._pending else None
+                        await asyncio.to_thread(self._drop_segments, oldest_live)
+                    try:
+                        await invalidate_feeds_for_buyers(session, list({row["email"] for row in batch}))
+                    except Exception as e:
+                        # The edges are written; feeds catch up within home_feed_max_staleness.
+                        print(f"Error invalidating home feeds after order flush: {e}")
+            except Exception:
+                self.failures += 1
+                raise
+            self.batches += 1
+            self.flushed += len(batch)
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while self._pending:
+                    await self.flush()
+            except Exception as e:
+                # Left queued; retried on the next tick.
+                print(f"Error flushing order journal: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._file is not None,
+            "segments": len(self._segments),
+            "pending": len(self._pending),
+            "lag_seconds": round(self.lag(), 3),
+            "replayed": self.replayed,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+
+order_journal = OrderJournal(
+    settings.order_journal_dir,
+    batch_size=settings.order_flush_batch_size,
+    interval=settings.order_flush_interval,
+    max_lag=settings.order_flush_max_lag,
+    max_pending=settings.order_journal_max_pending,
+)
@@ -0,0 +1,23 @@
+import base64
+import json
+from typing import Any, Optional
+from fastapi import HTTPException, status
+
+
+def encode_cursor(after: Any) -> str:
+    """Opaque cursor for keyset pagination: the sort key of the last row served."""
+    payload = json.dumps({"after": after}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Any:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded))["after"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor."
+        )
@@ -0,0 +1,72 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from config import Settings
+
+settings = Settings()
+
+# Pinning min/max to the configured work factor makes any stored hash with a
+# different cost show up in needs_update, which drives the rehash on login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+    bcrypt__max_rounds=settings.bcrypt_rounds,
+)
+
+_executor: Optional[Executor] = None
+_pending: Optional[asyncio.Semaphore] = None
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if settings.password_hash_executor == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                thread_name_prefix="bcrypt"
+            )
+    return _executor
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(settings.password_hash_max_pending)
+    # Bound the backlog so a login burst queues here instead of piling up
+    # unbounded work in the executor.
+    async with _pending:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), fn, *args)
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run(_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Checks the password off the event loop.
+    Returns (valid, new_hash) where new_hash is set when the stored hash used
+    an outdated work factor and should be written back.
+    """
+    return await _run(_verify_and_update, plain_password, hashed_password)
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
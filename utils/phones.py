@@ -0,0 +1,122 @@
+"""
+Process-local set of registered phone numbers.
+
+Most numbers in an imported address book are not users. Filtering them out
+here keeps the friendship write transaction down to real matches. The set is
+exact (a 10-digit number per user is cheap to hold).
+
+Every user create/register/delete bumps a shared counter on a
+(:PhoneDirectoryVersion) node in the same transaction, and the set records
+the counter value it reflects. filter() reads the counter first: if it moved
+(a user was written through another worker), every number is passed through
+to the write query, which matches them itself, and the set is reloaded in
+the background. A registered number is therefore never dropped.
+"""
+import asyncio
+from typing import Dict, List, Optional, Set
+from neo4j import AsyncSession
+from database import session_scope
+
+PHONES_VERSION_QUERY = """
+MATCH (v:PhoneDirectoryVersion {id: 'users'})
+RETURN v.version AS version
+"""
+
+REGISTERED_PHONES_QUERY = """
+MATCH (u:User)
+WHERE u.phone IS NOT NULL
+RETURN u.phone AS phone
+"""
+
+
+class PhoneDirectory:
+    def __init__(self):
+        self._phones: Optional[Set[str]] = None
+        # Counter value the set reflects. None until first loaded: nothing is filtered then.
+        self.version: Optional[int] = None
+        self._reload_task: Optional[asyncio.Task] = None
+        self.filtered = 0
+        self.passed = 0
+        self.passed_through = 0
+        self.reloads = 0
+        self.reload_failures = 0
+
+    async def _shared_version(self, db: AsyncSession) -> int:
+        result = await db.run(PHONES_VERSION_QUERY)
+        record = await result.single()
+        return (record["version"] if record else None) or 0
+
+    async def load(self, db: AsyncSession):
+        # The counter is read before the phones. A user written in between is
+        # then in the set but not in the version, so the next filter reloads
+        # again instead of trusting a set that is missing someone.
+        version = await self._shared_version(db)
+        result = await db.run(REGISTERED_PHONES_QUERY)
+        phones = set()
+        async for record in result:
+            phones.add(str(record["phone"]))
+        # add()/discard() may have moved the set past this snapshot meanwhile.
+        if self.version is None or version >= self.version:
+            self._phones = phones
+            self.version = version
+        self.reloads += 1
+
+    async def _reload(self):
+        try:
+            async with session_scope() as session:
+                await self.load(session)
+        except Exception as e:
+            # Numbers keep passing through unfiltered until a reload succeeds.
+            self.reload_failures += 1
+            print(f"Error reloading registered phones: {e}")
+        finally:
+            self._reload_task = None
+
+    def _schedule_reload(self):
+        if self._reload_task is None:
+            self._reload_task = asyncio.get_running_loop().create_task(self._reload())
+
+    async def filter(self, db: AsyncSession, numbers: List[str]) -> List[str]:
+        """
+        The subset of `numbers` that may belong to a user, in order. All of
+        them when the set is behind the shared counter.
+        """
+        if self._phones is None or await self._shared_version(db) != self.version:
+            self._schedule_reload()
+            self.passed_through += len(numbers)
+            return list(numbers)
+        phones = self._phones
+        registered = [number for number in numbers if number in phones]
+        self.passed += len(registered)
+        self.filtered += len(numbers) - len(registered)
+        return registered
+
+    def _apply(self, version: int) -> bool:
+        # Exact only if the set was one write behind; otherwise the next filter reloads.
+        if self._phones is None or self.version != version - 1:
+            return False
+        self.version = version
+        return True
+
+    def add(self, phone: Optional[str], version: int):
+        """`version` is the counter value the creating transaction bumped to."""
+        if self._apply(version) and phone:
+            self._phones.add(phone)
+
+    def discard(self, phone: Optional[str], version: int):
+        if self._apply(version) and phone:
+            self._phones.discard(phone)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "size": len(self._phones) if self._phones is not None else None,
+            "version": self.version,
+            "reloads": self.reloads,
+            "reload_failures": self.reload_failures,
+            "filtered": self.filtered,
+            "passed": self.passed,
+            "passed_through": self.passed_through,
+        }
+
+
+registered_phones = PhoneDirectory()
@@ -0,0 +1,23 @@
+from typing import Any, Dict, List, Tuple, Union
+from neo4j import AsyncSession, AsyncManagedTransaction
+
+GET_PRODUCTS_BY_IDS_QUERY = """
+UNWIND $productIds AS id
+MATCH (p:Product {productId: id})
+RETURN p.productId AS productId, p.name AS name, p.price AS price
+"""
+
+
+async def get_products_by_ids(
+    db: Union[AsyncSession, AsyncManagedTransaction], product_ids: List[Any]
+) -> Tuple[Dict[Any, Dict[str, Any]], List[Any]]:
+    """
+    Resolves many products in one query, one index lookup per id.
+    Returns ({productId: {productId, name, price}}, [ids with no product]).
+    Works on a session or inside a transaction function.
+    """
+    unique_ids = list(dict.fromkeys(product_ids))
+    result = await db.run(GET_PRODUCTS_BY_IDS_QUERY, productIds=unique_ids)
+    found = {record["productId"]: record.data() async for record in result}
+    missing = [product_id for product_id in unique_ids if product_id not in found]
+    return found, missing
@@ -0,0 +1,33 @@
+"""
+JSON rendering with orjson.
+
+ORJSONResponse is the application's default response class. Handlers that
+return raw Neo4j data (home, get_product) return it directly, which skips
+FastAPI's jsonable_encoder pass over every nested property.
+"""
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    # neo4j temporal types (DateTime, Date, Time, Duration) expose ISO formatting.
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
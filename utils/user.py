@@ -1,4 +1,4 @@
-from neo4j import Session
+from neo4j import AsyncSession, AsyncManagedTransaction
 from fastapi import Depends,HTTPException, status
 from typing import List
 from typing import Annotated
@@ -7,6 +7,13 @@ from schemas.schema import User
 from schemas.schema import OrderRequest, OrderRelationDetail, OrderCreationResponse
 from datetime import datetime
 from pydantic import BaseModel
+from config import Settings
+from utils.network import extend_network, get_dependent_users
+from utils.phones import registered_phones
+from utils.product import get_products_by_ids
+from utils.order_journal import order_journal
+from uuid import uuid4
+from utils.feed import invalidate_home_feeds, invalidate_feeds_for_buyers
 
 class MessageResponse(BaseModel):
     user_id: str
@@ -15,73 +22,66 @@ class MessageResponse(BaseModel):
 
 
 user_dependency = Annotated[User, Depends(verify_jwt_token)]
-
-
-def create_friend(contact:List[str],phone, db:Session):
-    print(f"phone: form utils file {phone}")
-    query = """
-    MATCH (u1:User {phone:$phone})
-    WITH u1, $friendPhoneNumbers AS friendPhoneNumbers
-    UNWIND friendPhoneNumbers AS targetPhoneNumber
-    OPTIONAL MATCH (u2:User {phone:targetPhoneNumber})
-    FOREACH (
-        n IN CASE WHEN u2 IS NOT NULL THEN [1] ELSE [] END | // Only execute if u2 is found
-        MERGE (u1)-[:FRIEND]->(u2)
-    )
-    RETURN u1.phone AS user1Phone, u2.phone AS user2Phone, targetPhoneNumber, // Return specific properties
-           CASE WHEN u2 IS NOT NULL THEN true ELSE false END AS u2_found,
-           CASE WHEN (u1)-[:FRIEND]->(u2) THEN true ELSE false END AS friendship_exists_after_merge // Check if relation exists
+settings = Settings()
+
+
+# Only numbers that belong to a User produce rows; the CALL keeps one result
+# row per chunk and yields none at all when the importing user does not exist.
+CREATE_FRIENDS_QUERY = """
+MATCH (u1:User {phone: $phone})
+CALL (u1) {
+    UNWIND $friendPhoneNumbers AS targetPhoneNumber
+    MATCH (u2:User {phone: targetPhoneNumber})
+    WHERE u2 <> u1
+    OPTIONAL MATCH (u1)-[existing:FRIEND]->(u2)
+    WITH u1, u2, existing
+    MERGE (u1)-[:FRIEND]->(u2)
+    RETURN count(u2) AS matched, collect(CASE WHEN existing IS NULL THEN u2.phone END) AS added
+}
+RETURN matched, added
+"""
+
+async def _create_friends_chunk(tx: AsyncManagedTransaction, phone: str, numbers: List[str]):
+    result = await tx.run(CREATE_FRIENDS_QUERY, phone=phone, friendPhoneNumbers=numbers)
+    record = await result.single()
+    summary = await result.consume()
+    if record is None:
+        return None
+    # NETWORK follows the new FRIEND edges in the same transaction.
+    await extend_network(tx, phone, record["added"])
+    return record["matched"], summary.counters.relationships_created
+
+async def create_friend(contact:List[str],phone, db:AsyncSession):
     """
-    
+    Merges FRIEND edges from the user to every registered number in `contact`,
+    in chunks of contact_import_chunk_size, one write transaction per chunk.
+    Returns a summary with counts rather than a row per contact.
+    """
+    submitted = len(contact)
+    matched = 0
+    created = 0
+    chunk_size = settings.contact_import_chunk_size
     try:
-        print("Executing query...")
-        # Get all results, as contact can be a list of multiple phone numbers
-        all_results = db.run(query, phone=phone, friendPhoneNumbers=contact).data()
-        
-
-        if not all_results:
-            # This case means u1 (the current user) was not found.
-            # The initial MATCH (u1:User {phone:$phone}) failed.
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with phone number {phone} not found. Cannot create friendship."
-            )
+        if settings.phone_directory_enabled:
+            contact = await registered_phones.filter(db, contact)
+        for start in range(0, max(len(contact), 1), chunk_size):
+            counts = await db.execute_write(_create_friends_chunk, phone, contact[start:start + chunk_size])
+            if counts is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"User with phone number {phone} not found. Cannot create friendship."
+                )
+            matched += counts[0]
+            created += counts[1]
 
-        successfully_processed_friends = []
-        failed_to_find_friends = []
-
-        # Iterate through the results to see what happened for each targetPhoneNumber
-        for record in all_results:
-            user1_phone = record.get('user1Phone')
-            user2_phone = record.get('user2Phone')
-            target_phone_number_from_query = record.get('targetPhoneNumber')
-            u2_found = record.get('u2_found')
-            friendship_exists = record.get('friendship_exists_after_merge')
-
-            if u2_found: # This means u2 was found, and MERGE would have run
-                successfully_processed_friends.append({
-                    "target_phone": target_phone_number_from_query,
-                    "friendship_status": "CREATED" if friendship_exists else "ALREADY_EXISTS"
-                })
-            else: # u2 was not found
-                failed_to_find_friends.append(target_phone_number_from_query)
-
-        response_message = "Friendship processing complete."
-        if failed_to_find_friends:
-            response_message += (
-                f" Could not find users with phone numbers: "
-                f"{', '.join(failed_to_find_friends)}."
-            )
-        if not successfully_processed_friends and not failed_to_find_friends:
-             # This highly unlikely if all_results is not empty, but good for robustness
-             response_message = "No friends processed due to an unknown issue."
+        if created:
+            invalidate_home_feeds([phone, *await get_dependent_users(db, [phone])])
 
-        print(f"Successfully processed friends: {successfully_processed_friends}")
-        print(f"Failed to find friends: {failed_to_find_friends}")
         return {
-            "message": response_message,
-            "processed_friends": successfully_processed_friends,
-            "failed_to_find": failed_to_find_friends
+            "submitted": submitted,
+            "matched_users": matched,
+            "friendships_created": created,
+            "not_registered": submitted - matched,
         }
 
     except HTTPException as he:
@@ -93,10 +93,46 @@ def create_friend(contact:List[str],phone, db:Session):
             detail=f"An internal server error occurred while creating friendship: {e}"
         )
     
-def create_order_relation(product_ids_list: List[int], user: user_dependency, db: Session) -> OrderCreationResponse:
+async def _journal_order_relation(product_ids_list: List[int], user: user_dependency, db: AsyncSession, timestamp: str) -> OrderCreationResponse:
+    """
+    Write-behind checkout: products are checked with a read, the edges are
+    appended to the order journal and written to Neo4j by its flusher.
+    """
+    products, missing = await get_products_by_ids(db, product_ids_list)
+    rows = [
+        {"order_key": uuid4().hex, "email": user.email, "productId": product_id, "timestamp": timestamp}
+        for product_id in product_ids_list if product_id in products
+    ]
+    if rows:
+        try:
+            await order_journal.append(rows)
+        except Exception as e:
+            print(f"Error journaling order relationships: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Orders cannot be accepted right now, please retry."
+            )
+
+    message = "Order processing complete."
+    if rows:
+        message += f" Accepted {len(rows)} order relationship(s)."
+    if missing:
+        message += f" Failed to order products with IDs: {', '.join(map(str, missing))} (product not found)."
+    return OrderCreationResponse(
+        message=message,
+        created_orders=[
+            OrderRelationDetail(email=row["email"], productId=row["productId"], timestamp=row["timestamp"])
+            for row in rows
+        ]
+    )
+
+async def create_order_relation(product_ids_list: List[int], user: user_dependency, db: AsyncSession) -> OrderCreationResponse:
 
     timestamp = datetime.now().isoformat()
 
+    if settings.order_write_behind:
+        return await _journal_order_relation(product_ids_list, user, db, timestamp)
+
     query = """
     MATCH (u:User {email: $email})
     WITH u, $productIds AS productIdsList
@@ -121,7 +157,11 @@ def create_order_relation(product_ids_list: List[int], user: user_dependency, db
     }
 
     try:
-        results = db.run(query, params).data()
+        result = await db.run(query, params)
+        results = await result.data()
+
+        if any(record["product_found"] for record in results):
+            await invalidate_feeds_for_buyers(db, [user.email])
 
         created_orders_list: List[OrderRelationDetail] = []
         failed_to_order_products: List[str] = []